@@ -1,9 +1,11 @@
-from flask import Flask, request, jsonify, send_file, session
+from flask import Flask, Response, request, jsonify, send_file, session, url_for, abort, redirect
+from flask.sessions import SessionInterface
 from flask_session import Session
 from werkzeug.utils import secure_filename
 import PyPDF2
+import ebooklib
 from ebooklib import epub
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
 import re
 import threading
 import queue
@@ -15,36 +17,1447 @@ import tempfile
 import os
 import json
 import hashlib
+import uuid
+import heapq
+import itertools
+import bisect
+import math
+import base64
+import html
+import shutil
+import struct
+import subprocess
+import gzip
+import mimetypes
+import sys
+import multiprocessing
+import sqlite3
+import asyncio
+import atexit
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future
+from urllib.parse import parse_qsl
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import HTTPException
+try:
+    import brotli
+except ImportError:
+    brotli = None  # Optional; gzip variants are served without it
+try:
+    from PIL import Image
+except ImportError:
+    Image = None  # Optional; image thumbnails fall back to the original file
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None  # Optional; only needed for SERVE_MODE=asgi
 
 app = Flask(__name__)
 app.secret_key = 'some_secret_key'  
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  
 app.config['SESSION_TYPE'] = 'filesystem'
+# Only requests that change the session write it back; otherwise a slow audio
+# request would save its stale copy over a cursor moved meanwhile
+app.config['SESSION_REFRESH_EACH_REQUEST'] = False
 Session(app)
 
-audio_cache = {}
-audio_generation_queue = queue.Queue()
 stop_generation_event = threading.Event()
-MAX_PRELOADED_FUTURE = 50  
-MAX_RETAINED_PAST = 20     
-
-def extract_text_from_pdf(file):
-    """Extract text from a PDF file."""
-    reader = PyPDF2.PdfReader(file)
-    text = ''
-    for page in reader.pages:
-        text += page.extract_text()
-    return text
-
-def extract_text_from_epub(file):
-    """Extract text from an EPUB file."""
+MAX_PRELOADED_FUTURE = 50  # Upper bound; the actual window adapts to each reader (see PreloadWindow)
+MAX_RETAINED_PAST = 20
+MIN_PRELOADED_FUTURE = 5
+MIN_RETAINED_PAST = 3
+SKIM_SECONDS = 1.5  # Readers moving on faster than this per phrase aren't listening
+URGENT_LOOKAHEAD = 3  # Phrases right after the cursor that jump ahead of every other job
+FOREGROUND_PRIORITY = (-1, 0)  # The phrase a reader just landed on
+NAVIGATION_SETTLE_SECONDS = 0.3  # Quiet time after a move before the full window is re-planned
+AUDIO_WAIT_SECONDS = 25  # Longest an /audio_wait long-poll is held open
+SYNTHESIS_LEASE_SECONDS = 90  # A claim on a clip outlives any single TTS call; after that another process may take over
+STORE_POLL_SECONDS = 0.25  # How often waiters look for clips made by other server processes
+AUDIO_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Shared by every reader on this server
+TTS_BACKEND = os.environ.get('TTS_BACKEND', 'gtts')  # One of the registered TTS_BACKENDS
+TTS_VOICE = 'en'
+TTS_SLOW = False
+TTS_WORKERS = int(os.environ.get('TTS_WORKERS', 4))
+TTS_BACKEND_CONCURRENCY = {}  # Per-backend overrides of the simultaneous calls each backend declares when registered
+SERVER_PROCESSES = int(os.environ.get('SERVER_PROCESSES', 1))  # Set to the worker count when a server runs several copies of the app
+SERVE_MODE = os.environ.get('SERVE_MODE', 'wsgi')  # 'asgi' serves long-lived endpoints and preloading from an event loop
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 32))  # Threads running the plain Flask routes in ASGI mode
+AUDIO_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audio_store')
+AUDIO_STORE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+AUDIO_STORE_TOUCH_SECONDS = 5  # Reads update last-use times in the shared index in batches this far apart
+DOCUMENT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'documents')
+MAX_LOADED_DOCUMENTS = 16  # Parsed documents kept in memory across all readers
+DOCUMENT_CHECKPOINT_SECONDS = 2  # How often a document being indexed is written out for other server processes
+DOCUMENT_STALE_SECONDS = 120  # A partial document left unwritten this long was abandoned by a process that died
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+PDF_EXTRACT_WORKERS = os.cpu_count() or 2
+PDF_PAGES_PER_TASK = 8
+PHRASE_BOUNDARY = re.compile(r'(?<=[.?!])\s+')
+SEARCH_RESULT_LIMIT = 100  # Matches returned with snippets; the total count is always exact
+SNIPPET_RADIUS = 40
+FILE_PATH_PATTERN = re.compile(r'file:///.*?\.htm')
+CLICKABLE_WORD = re.compile(r'(?<!\w)[A-Za-z]{3,}(?!\w)')  # Whole ASCII words longer than 2 chars
+SSE_KEEPALIVE_SECONDS = 15
+SSE_MAX_QUEUED_EVENTS = 1000  # A slower subscriber gets a fresh snapshot instead
+UI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'ui')
+UI_ASSET_MAX_AGE = 365 * 24 * 60 * 60  # Versioned asset URLs never change content
+AUDIO_MAX_AGE = 365 * 24 * 60 * 60  # Audio URLs are content-addressed, so clips never change
+AUDIO_DIGEST_PATTERN = re.compile(r'[0-9a-f]{64}')
+AUDIO_PREFETCH_COUNT = 5  # Upcoming clips listed in /audio_manifest by default
+STREAM_MAX_PHRASES = 200  # Longest run of phrases one /stream_audio response covers
+MP3_BITRATES = {  # kbps by bitrate index, Layer III
+    'mpeg1': (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    'mpeg2': (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}  # By version bits
+MEDIA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+MEDIA_THUMBNAIL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'media_thumbnails')
+MEDIA_THUMBNAIL_SIZE = (320, 180)
+MEDIA_PAGE_SIZE = 24
+MEDIA_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+MEDIA_VIDEO_EXTENSIONS = ('.mp4',)
+
+class AudioCache:
+    """LRU cache of phrase audio keyed by (document, voice, phrase index).
+
+    All readers share one memory budget. Each reader registers the keys around
+    its cursor as a working set; eviction drops unpinned entries first so one
+    reader jumping around does not throw away audio another reader is about to hear.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.working_sets = {}
+        self.listeners = []
+        self.lock = threading.RLock()
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def get(self, key):
+        """Return the cached audio bytes for a key, marking them recently used."""
+        with self.lock:
+            audio_data = self.entries.get(key)
+            if audio_data is not None:
+                self.entries.move_to_end(key)
+            return audio_data
+
+    def put(self, key, audio_data):
+        """Store immutable audio bytes and evict old entries if over budget."""
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= len(self.entries.pop(key))
+            self.entries[key] = audio_data
+            self.total_bytes += len(audio_data)
+            self._notify('cached', key)
+            self._evict()
+
+    def set_working_set(self, reader_id, keys):
+        """Replace the set of keys a reader currently needs kept in memory."""
+        with self.lock:
+            self.working_sets[reader_id] = set(keys)
+
+    def drop_working_set(self, reader_id):
+        """Forget a reader's working set, leaving its audio to normal LRU eviction."""
+        with self.lock:
+            self.working_sets.pop(reader_id, None)
+
+    def is_wanted(self, key):
+        """Check whether any reader still has the key in its working set."""
+        with self.lock:
+            return any(key in keys for keys in self.working_sets.values())
+
+    def cached_indices(self, doc_id, voice):
+        """Return the phrase indices cached for one document and voice."""
+        with self.lock:
+            return [key[2] for key in self.entries if key[0] == doc_id and key[1] == voice]
+
+    def _notify(self, event, key):
+        # Listeners must not block; they are called with the cache lock held
+        for listener in self.listeners:
+            listener(event, key)
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        pinned = set().union(*self.working_sets.values())
+
+        # First pass drops entries nobody is reading, oldest first
+        for key in [k for k in self.entries if k not in pinned]:
+            if self.total_bytes <= self.max_bytes:
+                return
+            self.total_bytes -= len(self.entries.pop(key))
+            self._notify('evicted', key)
+
+        # Still over budget: fall back to plain LRU across all readers
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            key, audio_data = self.entries.popitem(last=False)
+            self.total_bytes -= len(audio_data)
+            self._notify('evicted', key)
+
+def sqlite_connect(path):
+    """Open a SQLite database shared by several server processes; callers serialize use within a process."""
+    db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    return db
+
+class AudioStore:
+    """Content-addressed audio store on disk that survives restarts and re-uploads.
+
+    Files live in a two-level sharded directory named by digest. A SQLite
+    index keeps sizes and last use so the store can be capped. Every server
+    process pointed at the same directory shares both the files and the index.
+    Reads go through their own connection, so they never queue behind a
+    write waiting on another process, and only record last use in memory;
+    those times are written in batches.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.db_path = os.path.join(root, 'index.sqlite3')
+        self.lock = threading.Lock()
+        self.read_lock = threading.Lock()
+        self.touch_lock = threading.Lock()
+        self.touched = {}
+        self.touch_timer = None
+        os.makedirs(root, exist_ok=True)
+        self.db = sqlite_connect(self.db_path)
+        self.db.execute('CREATE TABLE IF NOT EXISTS audio (digest TEXT PRIMARY KEY, size INTEGER NOT NULL, used REAL NOT NULL)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS audio_used ON audio (used)')
+        self.reader = sqlite_connect(self.db_path)
+        if self.db.execute('SELECT COUNT(*) FROM audio').fetchone()[0] == 0:
+            self._load_index()
+
+    def __contains__(self, digest):
+        with self.read_lock:
+            return self.reader.execute('SELECT 1 FROM audio WHERE digest = ?', (digest,)).fetchone() is not None
+
+    def path_for(self, digest):
+        """Return the sharded file path for a digest."""
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def locate(self, digest):
+        """Return the file path and mimetype of a stored clip, or None, without a lookup in the index."""
+        path = self.path_for(digest)
+        try:
+            with open(path, 'rb') as f:
+                mimetype = audio_mimetype(f.read(4))
+        except OSError:
+            return None
+        self._touch(digest)
+        return path, mimetype
+
+    def get(self, digest):
+        """Return stored audio bytes for a digest, or None if not stored."""
+        if digest not in self:
+            return None
+        try:
+            with open(self.path_for(digest), 'rb') as f:
+                audio_data = f.read()
+        except OSError:
+            # File vanished behind our back (or another process evicted it); forget it
+            with self.lock:
+                self.db.execute('DELETE FROM audio WHERE digest = ?', (digest,))
+            return None
+        self._touch(digest)
+        return audio_data
+
+    def put(self, digest, audio_data):
+        """Write audio bytes for a digest and evict old files if over the cap."""
+        path = self.path_for(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(audio_data)
+        os.replace(tmp_path, path)
+
+        with self.touch_lock:
+            touched, self.touched = self.touched, {}
+        with self.lock:
+            # One write transaction at a time across processes, so eviction sees a consistent total
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                self._write_touched(touched)
+                self.db.execute('INSERT OR REPLACE INTO audio (digest, size, used) VALUES (?, ?, ?)', (digest, len(audio_data), time.time()))
+                self._evict(digest)
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+            self.db.execute('COMMIT')
+
+    def flush(self):
+        """Write the last-use times recorded since the previous batch."""
+        with self.touch_lock:
+            touched, self.touched = self.touched, {}
+            self.touch_timer = None
+        if not touched:
+            return
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                self._write_touched(touched)
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+            self.db.execute('COMMIT')
+
+    def _touch(self, digest):
+        with self.touch_lock:
+            self.touched[digest] = time.time()
+            if self.touch_timer is None:
+                self.touch_timer = threading.Timer(AUDIO_STORE_TOUCH_SECONDS, self.flush)
+                self.touch_timer.daemon = True
+                self.touch_timer.start()
+
+    def _write_touched(self, touched):
+        self.db.executemany(
+            'UPDATE audio SET used = MAX(used, ?) WHERE digest = ?',
+            [(used, digest) for digest, used in touched.items()]
+        )
+
+    def _evict(self, keep):
+        total_bytes = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM audio').fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+        oldest = self.db.execute('SELECT digest, size FROM audio WHERE digest != ? ORDER BY used', (keep,))
+        evicted = []
+        for digest, size in oldest:
+            if total_bytes <= self.max_bytes:
+                break
+            evicted.append(digest)
+            total_bytes -= size
+        self.db.executemany('DELETE FROM audio WHERE digest = ?', [(digest,) for digest in evicted])
+        for digest in evicted:
+            try:
+                os.unlink(self.path_for(digest))
+            except OSError:
+                pass
+
+    def _load_index(self):
+        # Carry over the JSON index of older versions, or rebuild from the files on disk
+        try:
+            with open(os.path.join(self.root, 'index.json')) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = self._scan()
+        # Keep the old least-recently-used order
+        now = time.time() - len(entries)
+        with self.lock:
+            self.db.executemany(
+                'INSERT OR IGNORE INTO audio (digest, size, used) VALUES (?, ?, ?)',
+                [(digest, size, now + i) for i, (digest, size) in enumerate(entries)]
+            )
+
+    def _scan(self):
+        # Rebuild the index from the files on disk, oldest first
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if '.' not in filename and dirpath != self.root:
+                    stat = os.stat(os.path.join(dirpath, filename))
+                    found.append((stat.st_mtime, filename, stat.st_size))
+        return [(digest, size) for _, digest, size in sorted(found)]
+
+class SearchIndex:
+    """Trigram index over a document's phrases for case-insensitive substring search.
+
+    Postings map each lowercased trigram to the ascending phrase indices that
+    contain it. Candidates from the rarest trigrams are confirmed with a plain
+    substring check, so results match the old linear scan exactly.
+    """
+
+    def __init__(self, postings=None, size=0):
+        self.postings = postings if postings is not None else {}
+        self.size = size
+
+    @staticmethod
+    def trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def add(self, index, phrase):
+        """Index a phrase; phrases must be added in increasing index order."""
+        for gram in self.trigrams(phrase.lower()):
+            self.postings.setdefault(gram, []).append(index)
+        self.size = index + 1
+
+    def search(self, query, phrases):
+        """Return the ascending indices of every phrase containing the query."""
+        query = query.lower()
+        grams = self.trigrams(query)
+        if grams:
+            postings = sorted((self.postings.get(gram, []) for gram in grams), key=len)
+            candidates = sorted(set(postings[0]).intersection(*postings[1:]))
+        else:
+            # Queries shorter than a trigram have to look at every phrase
+            candidates = range(min(self.size, len(phrases)))
+        return [i for i in candidates if query in phrases[i].lower()]
+
+    def to_json(self):
+        return {'size': self.size, 'postings': self.postings}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['postings'], data['size'])
+
+    @classmethod
+    def build(cls, phrases):
+        index = cls()
+        for i, phrase in enumerate(phrases):
+            index.add(i, phrase)
+        return index
+
+class Document:
+    """A parsed document: its id, title, phrase list and chapter starts.
+
+    While a document is still being indexed in the background, phrases and
+    chapters are only ever appended and complete stays False. Each chapter is
+    a [first phrase index, chapter title] pair. rendered holds the display HTML
+    of every phrase, built in batches as phrases arrive.
+    """
+
+    def __init__(self, doc_id, title, phrases, complete=True, chapters=None, search_index=None):
+        self.doc_id = doc_id
+        self.title = title
+        self.phrases = phrases
+        self.complete = complete
+        self.chapters = chapters if chapters is not None else []
+        self.failed = False
+        if search_index is None or search_index.size != len(phrases):
+            search_index = SearchIndex.build(phrases)
+        self.search_index = search_index
+        self.rendered = render_phrases(phrases)
+
+    def extend(self, phrases):
+        """Append phrases, rendering and indexing them."""
+        # Rendered HTML goes first so any phrase a reader can see is already rendered
+        self.rendered.extend(render_phrases(phrases))
+        for phrase in phrases:
+            self.phrases.append(phrase)
+            self.search_index.add(len(self.phrases) - 1, phrase)
+
+    def to_json(self):
+        return {
+            'doc_id': self.doc_id,
+            'title': self.title,
+            'phrases': self.phrases,
+            'complete': self.complete,
+            'failed': self.failed,
+            'chapters': self.chapters
+        }
+
+    @classmethod
+    def from_json(cls, data, search_index=None):
+        document = cls(
+            data['doc_id'], data['title'], data['phrases'],
+            data.get('complete', True), data.get('chapters', []), search_index
+        )
+        document.failed = data.get('failed', False)
+        return document
+
+class DocumentStore:
+    """Parsed documents on disk keyed by document id, the most recent kept in memory.
+
+    Sessions only carry a document id and a cursor, so a page turn rewrites a
+    few bytes of session state no matter how large the book is. A document
+    still being indexed is written out as it grows, so other server processes
+    sharing the directory can read it too; they pick up new phrases whenever
+    its file changes.
+    """
+
+    def __init__(self, root, max_loaded):
+        self.root = root
+        self.max_loaded = max_loaded
+        self.loaded = OrderedDict()
+        self.ingesting = {}
+        self.versions = {}  # doc_id -> mtime of the file last read or written for a partial or failed document
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, doc_id):
+        """Return the JSON file path for a document id."""
+        return os.path.join(self.root, secure_filename(doc_id) + '.json')
+
+    def index_path_for(self, doc_id):
+        """Return the search index file path stored next to a document."""
+        return os.path.join(self.root, secure_filename(doc_id) + '.index.json')
+
+    def get(self, doc_id):
+        """Return a document by id, loading it from disk if needed, or None."""
+        with self.lock:
+            if doc_id in self.ingesting:
+                return self.ingesting[doc_id]
+            document = self.loaded.get(doc_id)
+            if document is not None:
+                self.loaded.move_to_end(doc_id)
+        if document is not None:
+            if document.complete and not document.failed:
+                return document
+            return self._catch_up(document)
+        try:
+            version = os.stat(self.path_for(doc_id)).st_mtime_ns
+            with open(self.path_for(doc_id)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            with open(self.index_path_for(doc_id)) as f:
+                search_index = SearchIndex.from_json(json.load(f))
+        except (OSError, ValueError, KeyError):
+            # Rebuilt from the phrases by Document
+            search_index = None
+        document = Document.from_json(data, search_index)
+        if not document.complete or document.failed:
+            with self.refresh_lock:
+                self.versions[doc_id] = version
+            self._check_stale(document, version)
+        self._remember(document)
+        return document
+
+    def add(self, document):
+        """Hold a document that is still being indexed in memory until it is saved."""
+        with self.lock:
+            self.ingesting[document.doc_id] = document
+
+    def checkpoint(self, document):
+        """Write out what has been indexed of a document so far, for other server processes to read."""
+        self._write_document(document)
+
+    def save(self, document):
+        """Write a document and its search index to disk and keep it loaded."""
+        # The index goes first so a document file on disk always has its index beside it
+        self._write_json(self.index_path_for(document.doc_id), document.search_index.to_json())
+        self._write_document(document)
+        self._remember(document)
+
+    def abandon(self, document):
+        """Stop holding a document whose ingestion failed; it stays loaded like any other until evicted.
+
+        It is written out marked failed, so other processes stop waiting for
+        more of it and a re-upload indexes it again.
+        """
+        self._remember(document)
+        try:
+            self._write_document(document)
+        except OSError:
+            # The disk may be why indexing failed; other processes will find the partial file stale
+            pass
+
+    def _write_document(self, document):
+        path = self.path_for(document.doc_id)
+        self._write_json(path, document.to_json())
+        with self.refresh_lock:
+            self.versions[document.doc_id] = os.stat(path).st_mtime_ns
+
+    def _catch_up(self, document):
+        # Another process may be indexing it, or have indexed it again after a failure
+        path = self.path_for(document.doc_id)
+        with self.refresh_lock:
+            try:
+                version = os.stat(path).st_mtime_ns
+                if version == self.versions.get(document.doc_id):
+                    self._check_stale(document, version)
+                    return document
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return document
+            self.versions[document.doc_id] = version
+            if len(data['phrases']) < len(document.phrases):
+                # Indexing started over; phrases are only ever appended to a Document
+                document = Document.from_json(data)
+                self._remember(document)
+            else:
+                document.extend(data['phrases'][len(document.phrases):])
+                document.chapters = data.get('chapters', [])
+                document.complete = data.get('complete', True)
+                document.failed = data.get('failed', False)
+            self._check_stale(document, version)
+            return document
+
+    def _check_stale(self, document, version):
+        if not document.complete and time.time() - version / 1e9 > DOCUMENT_STALE_SECONDS:
+            # Nobody has written to it in a long while; whoever was indexing it is gone
+            document.complete = True
+            document.failed = True
+
+    def _write_json(self, path, data):
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _remember(self, document):
+        with self.lock:
+            self.ingesting.pop(document.doc_id, None)
+            self.loaded[document.doc_id] = document
+            self.loaded.move_to_end(document.doc_id)
+            while len(self.loaded) > self.max_loaded:
+                self.loaded.popitem(last=False)
+
+class EventSubscription:
+    """One Server-Sent Events stream: a bounded queue of events for a reader and document."""
+
+    def __init__(self, reader_id, doc_id, cursor):
+        self.reader_id = reader_id
+        self.doc_id = doc_id
+        self.cursor = cursor
+        self.events = queue.Queue(maxsize=SSE_MAX_QUEUED_EVENTS)
+        self.overflowed = False
+        self.loop = None
+        self.wakeup = None
+
+    def bind_loop(self, loop):
+        """Have publishers on any thread wake an event-loop consumer instead of a blocked thread."""
+        self.wakeup = asyncio.Event()
+        self.loop = loop
+
+    def wake(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    def resync(self):
+        """After the queue overflowed, drop what is left in it and return True: deltas can't be replayed."""
+        if not self.overflowed:
+            return False
+        self.overflowed = False
+        while not self.events.empty():
+            self.events.get_nowait()
+        return True
+
+class EventBus:
+    """Fan-out of preload events to Server-Sent Events subscribers.
+
+    Cache events go to every subscriber reading the document; cursor events
+    only to the reader that moved.
+    """
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, reader_id, doc_id, cursor):
+        subscription = EventSubscription(reader_id, doc_id, cursor)
+        with self.lock:
+            self.subscriptions.setdefault(doc_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.doc_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscriptions.pop(subscription.doc_id, None)
+
+    def publish(self, doc_id, event, reader_id=None):
+        """Queue an event dict (with a 'type' key) for subscribers of a document."""
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(doc_id, ()))
+        for subscription in subscriptions:
+            if reader_id is not None and subscription.reader_id != reader_id:
+                continue
+            if event['type'] == 'cursor':
+                subscription.cursor = event['index']
+            try:
+                subscription.events.put_nowait(event)
+            except queue.Full:
+                subscription.overflowed = True
+            subscription.wake()
+
+    def cache_listener(self, event, key):
+        """AudioCache listener that turns cache changes into cached/evicted events."""
+        doc_id, _, index = key
+        if doc_id in self.subscriptions:
+            self.publish(doc_id, {'type': event, 'index': index})
+
+class SynthesisBackoff:
+    """Adaptive delay between preload jobs that grows on TTS failures and decays on success."""
+
+    def __init__(self, base=0.5, maximum=30.0):
+        self.base = base
+        self.maximum = maximum
+        self.delay = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self, stop_event):
+        """Sleep for the current delay, waking early if the stop event is set."""
+        if self.delay:
+            stop_event.wait(self.delay)
+
+    def success(self):
+        with self.lock:
+            self.delay = self.delay / 2 if self.delay > self.base else 0.0
+
+    def failure(self):
+        with self.lock:
+            self.delay = min(self.maximum, max(self.base, self.delay * 2))
+
+class SingleFlight:
+    """Registry of in-flight calls; concurrent callers for the same key share one future."""
+
+    def __init__(self):
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.futures
+
+    def run(self, key, fn):
+        """Call fn() unless a call for key is already running; either way return (or raise) its outcome."""
+        with self.lock:
+            future = self.futures.get(key)
+            leader = future is None
+            if leader:
+                future = self.futures[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.futures[key]
+
+    async def run_async(self, key, coro_fn):
+        """Like run(), awaiting coro_fn() instead; thread and event-loop callers share the same flights."""
+        with self.lock:
+            future = self.futures.get(key)
+            leader = future is None
+            if leader:
+                future = self.futures[key] = Future()
+        if not leader:
+            return await asyncio.wrap_future(future)
+
+        try:
+            result = await coro_fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.futures[key]
+
+class SynthesisCoordinator:
+    """Claims on clips being synthesized, kept in SQLite so every server process sees them.
+
+    A process claims a digest before calling the TTS backend; the others wait
+    for the clip to show up in the shared audio store rather than synthesize
+    it again. A claim lapses after its lease if its process died, and a
+    failure is recorded so waiters everywhere give up.
+    """
+
+    def __init__(self, db_path, lease_seconds):
+        self.lease_seconds = lease_seconds
+        self.owner = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self.lock = threading.Lock()
+        self.read_lock = threading.Lock()
+        self.db = sqlite_connect(db_path)
+        self.db.execute('CREATE TABLE IF NOT EXISTS synthesis (digest TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL, error TEXT)')
+        # Status polls read through their own connection, never behind a claim waiting on another process
+        self.reader = sqlite_connect(db_path)
+
+    def claim(self, digest):
+        """Take a digest for this process; False while another process holds a live claim on it."""
+        now = time.time()
+        with self.lock:
+            return self.db.execute(
+                'INSERT INTO synthesis (digest, owner, expires, error) VALUES (?, ?, ?, NULL) '
+                'ON CONFLICT (digest) DO UPDATE SET owner = excluded.owner, expires = excluded.expires, error = NULL '
+                'WHERE synthesis.owner = excluded.owner OR synthesis.expires < ? OR synthesis.error IS NOT NULL',
+                (digest, self.owner, now + self.lease_seconds, now)
+            ).rowcount == 1
+
+    def finish(self, digest):
+        with self.lock:
+            self.db.execute('DELETE FROM synthesis WHERE digest = ? AND owner = ?', (digest, self.owner))
+
+    def fail(self, digest, error):
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                'UPDATE synthesis SET error = ?, expires = ? WHERE digest = ? AND owner = ?',
+                (error, now, digest, self.owner)
+            )
+            # Failures only matter to current waiters
+            self.db.execute('DELETE FROM synthesis WHERE error IS NOT NULL AND expires < ?', (now - self.lease_seconds,))
+
+    def clear_failure(self, digest):
+        # Only write when there is a failure to clear; this runs on every navigation
+        if self.status(digest)[0] != 'failed':
+            return
+        with self.lock:
+            self.db.execute('DELETE FROM synthesis WHERE digest = ? AND error IS NOT NULL', (digest,))
+
+    def status(self, digest):
+        """Return ('running', None), ('failed', error) or (None, None) when nobody holds a claim."""
+        with self.read_lock:
+            row = self.reader.execute('SELECT expires, error FROM synthesis WHERE digest = ?', (digest,)).fetchone()
+        if row is None:
+            return None, None
+        expires, error = row
+        if error is not None:
+            return 'failed', error
+        return ('running', None) if expires >= time.time() else (None, None)
+
+class AudioReadiness:
+    """Lets requests wait for a clip to land in the disk store, or fail, without running synthesis themselves."""
+
+    def __init__(self, max_failures=1000):
+        self.max_failures = max_failures
+        self.failures = OrderedDict()
+        self.waiters = {}  # digest -> event-loop futures of wait_async() callers
+        self.changes = 0
+        self.condition = threading.Condition()
+
+    def ready(self, digest):
+        with self.condition:
+            self.failures.pop(digest, None)
+            self.changes += 1
+            self._wake(digest)
+            self.condition.notify_all()
+
+    def fail(self, digest, error):
+        with self.condition:
+            self.failures[digest] = error
+            while len(self.failures) > self.max_failures:
+                self.failures.popitem(last=False)
+            self.changes += 1
+            self._wake(digest)
+            self.condition.notify_all()
+
+    def retry(self, digest):
+        """Forget a clip's failure when it is queued again, so waiters wait for the new attempt."""
+        with self.condition:
+            self.failures.pop(digest, None)
+        synthesis_coordinator.clear_failure(digest)
+
+    def wait(self, digest, timeout):
+        """Block up to timeout seconds; return ('ready', None), ('failed', error) or ('pending', None)."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.condition:
+                changes = self.changes
+            outcome = self._outcome(digest)
+            if outcome is not None:
+                return outcome
+            with self.condition:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return 'pending', None
+                if self.changes == changes:
+                    # Clips made by other server processes are only noticed by polling
+                    self.condition.wait(min(remaining, STORE_POLL_SECONDS))
+
+    async def wait_async(self, digest, timeout):
+        """wait() for event-loop callers: suspends the coroutine rather than a thread."""
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + timeout
+        while True:
+            # Registered before checking, so a clip finishing in between still wakes us
+            future = loop.create_future()
+            with self.condition:
+                self.waiters.setdefault(digest, set()).add((loop, future))
+            try:
+                # The checks read SQLite, so they stay off the event loop
+                outcome = await asyncio.to_thread(self._outcome, digest)
+                if outcome is not None:
+                    return outcome
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return 'pending', None
+                await asyncio.wait([future], timeout=min(remaining, STORE_POLL_SECONDS))
+            finally:
+                with self.condition:
+                    waiters = self.waiters.get(digest, set())
+                    waiters.discard((loop, future))
+                    if not waiters:
+                        self.waiters.pop(digest, None)
+
+    def _outcome(self, digest):
+        # Queries the shared store and claim table; never called with the condition held
+        if digest in audio_store:
+            return 'ready', None
+        with self.condition:
+            error = self.failures.get(digest)
+        if error is not None:
+            return 'failed', error
+        status, error = synthesis_coordinator.status(digest)
+        if status == 'failed':
+            return status, error
+        return None
+
+    def _wake(self, digest):
+        for loop, future in self.waiters.pop(digest, ()):
+            loop.call_soon_threadsafe(lambda future=future: future.done() or future.set_result(None))
+
+class Debouncer:
+    """Runs a call once its key has been quiet for a delay; a newer call for the key replaces it."""
+
+    def __init__(self):
+        self.timers = {}
+        self.lock = threading.Lock()
+
+    def call(self, key, delay, fn, *args):
+        with self.lock:
+            timer = self.timers.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+            timer = threading.Timer(delay, self._fire, (key, fn, args))
+            timer.daemon = True
+            self.timers[key] = timer
+            timer.start()
+
+    def cancel(self, key):
+        with self.lock:
+            timer = self.timers.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+
+    def _fire(self, key, fn, args):
+        with self.lock:
+            # A call that lost the race with cancel() or a newer call() does nothing
+            if self.timers.get(key) is not threading.current_thread():
+                return
+            del self.timers[key]
+        try:
+            fn(*args)
+        except Exception as e:
+            print(f"Error in debounced call for {key}: {str(e)}")
+
+class PreloadWindow:
+    """Sizes each reader's preload window from how they read and how fast audio is made.
+
+    The future window covers the phrases the reader will reach while a clip is
+    being synthesized, with a safety factor; skimmers only get the minimum.
+    The past window grows with how often the reader steps back. Both shrink
+    toward their minimum as the audio cache fills up.
+    """
+
+    def __init__(self, safety=2.0, alpha=0.3):
+        self.safety = safety
+        self.alpha = alpha
+        self.synthesis_seconds = 1.0
+        self.readers = {}
+        self.lock = threading.Lock()
+
+    def observe_synthesis(self, seconds):
+        """Record how long one clip took to synthesize."""
+        with self.lock:
+            self.synthesis_seconds += self.alpha * (seconds - self.synthesis_seconds)
+
+    def observe_move(self, reader_id, doc_id, index):
+        """Record a cursor position; single steps update the reading pace and back rate."""
+        now = time.monotonic()
+        with self.lock:
+            reader = self.readers.setdefault(reader_id, {'dwell': 5.0, 'back_rate': 0.0, 'last': None})
+            last = reader['last']
+            reader['last'] = (doc_id, index, now)
+            if last is None or last[0] != doc_id or last[1] == index:
+                return
+            step = index - last[1]
+            if abs(step) != 1:
+                # Searches and chapter jumps say nothing about pace
+                return
+            reader['back_rate'] += self.alpha * ((1.0 if step < 0 else 0.0) - reader['back_rate'])
+            dwell = now - last[2]
+            if step > 0 and dwell < 120:
+                # Longer gaps are pauses, not reading
+                reader['dwell'] += self.alpha * (dwell - reader['dwell'])
+
+    def size(self, reader_id, pressure, overrides=None):
+        """Return (past, future) phrase counts for a reader given cache fullness (0..1)."""
+        with self.lock:
+            reader = self.readers.get(reader_id, {'dwell': 5.0, 'back_rate': 0.0})
+            if reader['dwell'] < SKIM_SECONDS:
+                future = MIN_PRELOADED_FUTURE
+            else:
+                future = math.ceil(self.safety * self.synthesis_seconds / reader['dwell']) + MIN_PRELOADED_FUTURE
+            past = MIN_RETAINED_PAST + round(reader['back_rate'] * (MAX_RETAINED_PAST - MIN_RETAINED_PAST))
+
+        if pressure > 0.75:
+            # Give memory back as the shared cache nears its budget
+            scale = max(0.0, (1.0 - pressure) / 0.25)
+            future = MIN_PRELOADED_FUTURE + int((future - MIN_PRELOADED_FUTURE) * scale)
+            past = MIN_RETAINED_PAST + int((past - MIN_RETAINED_PAST) * scale)
+
+        overrides = overrides or {}
+        if overrides.get('future') is not None:
+            future = overrides['future']
+        if overrides.get('past') is not None:
+            past = overrides['past']
+        return min(past, MAX_RETAINED_PAST), min(future, MAX_PRELOADED_FUTURE)
+
+    def stats(self, reader_id):
+        """Return the observations behind a reader's window, for display."""
+        with self.lock:
+            reader = self.readers.get(reader_id, {'dwell': 5.0, 'back_rate': 0.0})
+            return {
+                'seconds_per_phrase': round(reader['dwell'], 2),
+                'back_rate': round(reader['back_rate'], 2),
+                'synthesis_seconds': round(self.synthesis_seconds, 2)
+            }
+
+    def forget(self, reader_id):
+        with self.lock:
+            self.readers.pop(reader_id, None)
+
+class PreloadScheduler:
+    """Priority queue of preload jobs, deduplicated by cache key.
+
+    Each reader plans the window around its cursor; replanning cancels that
+    reader's jobs that fell outside the new window. A job shared by several
+    readers runs at the most urgent priority any of them currently asks for.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.jobs = {}
+        self.reader_jobs = {}
+        self.running = set()
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.listeners = []  # Called with no arguments when jobs are queued, for non-thread workers
+
+    def plan(self, reader_id, jobs):
+        """Replace a reader's queued jobs with (priority, key, phrase) tuples."""
+        with self.condition:
+            wanted = {key for _, key, _ in jobs}
+            for key in self.reader_jobs.get(reader_id, set()) - wanted:
+                self._release(reader_id, key)
+
+            for priority, key, phrase in jobs:
+                self._want(reader_id, priority, key, phrase)
+
+            self.reader_jobs[reader_id] = wanted - self.running
+            self.condition.notify_all()
+        self._notify()
+
+    def submit(self, reader_id, priority, key, phrase):
+        """Queue one job for a reader without touching its other planned jobs."""
+        with self.condition:
+            if self._want(reader_id, priority, key, phrase):
+                self.reader_jobs.setdefault(reader_id, set()).add(key)
+                self.condition.notify_all()
+        self._notify()
+
+    def cancel_reader(self, reader_id):
+        """Drop every job queued on behalf of a reader."""
+        with self.condition:
+            for key in self.reader_jobs.pop(reader_id, set()):
+                self._release(reader_id, key)
+
+    def get(self, timeout):
+        """Pop the most urgent job as (key, phrase), or None after the timeout."""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                while self.heap:
+                    priority, seq, key = heapq.heappop(self.heap)
+                    job = self.jobs.get(key)
+                    if job is None or job['seq'] != seq:
+                        continue
+                    del self.jobs[key]
+                    for reader_id in job['wants']:
+                        self.reader_jobs.get(reader_id, set()).discard(key)
+                    self.running.add(key)
+                    return key, job['phrase']
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+    def done(self, key):
+        """Mark a job handed out by get() as finished."""
+        with self.condition:
+            self.running.discard(key)
+
+    def _notify(self):
+        for listener in self.listeners:
+            listener()
+
+    def _want(self, reader_id, priority, key, phrase):
+        if key in self.running:
+            return False
+        job = self.jobs.get(key)
+        if job is None:
+            job = self.jobs[key] = {'phrase': phrase, 'wants': {}, 'priority': None, 'seq': None}
+        job['wants'][reader_id] = priority
+        self._reprioritize(key, job)
+        return True
+
+    def _reprioritize(self, key, job):
+        priority = min(job['wants'].values())
+        if priority != job['priority']:
+            # Older heap entries for this key go stale and are skipped on pop
+            job['priority'] = priority
+            job['seq'] = next(self.counter)
+            heapq.heappush(self.heap, (priority, job['seq'], key))
+
+    def _release(self, reader_id, key):
+        job = self.jobs.get(key)
+        if job is None:
+            return
+        job['wants'].pop(reader_id, None)
+        if job['wants']:
+            self._reprioritize(key, job)
+        else:
+            del self.jobs[key]
+
+class UIBundle:
+    """The reader UI in static/ui, held in memory with content hashes and precompressed variants.
+
+    index.html is rendered with versioned asset URLs, so assets can be cached
+    forever and only the page itself is revalidated. Everything is reloaded
+    when a file in the directory changes.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.stamp = None
+        self.assets = {}
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        """Return the asset dict for a file name, or None if there is no such asset."""
+        stamp = self._stamp()
+        with self.lock:
+            if stamp != self.stamp:
+                self._load()
+                self.stamp = stamp
+            return self.assets.get(name)
+
+    def _stamp(self):
+        return tuple((entry.name, entry.stat().st_mtime_ns) for entry in os.scandir(self.root))
+
+    def _load(self):
+        sources = {}
+        for name in os.listdir(self.root):
+            with open(os.path.join(self.root, name), 'rb') as f:
+                sources[name] = f.read()
+        assets = {name: self._make_asset(name, body) for name, body in sources.items() if name != 'index.html'}
+
+        # Render the page last, once the asset versions are known
+        template = app.jinja_env.from_string(sources['index.html'].decode('utf-8'))
+        page = template.render(
+            asset_url=lambda name: f"/ui/{assets[name]['version']}/{name}",
+            icons=sources['icons.svg'].decode('utf-8'),
+        )
+        assets['index.html'] = self._make_asset('index.html', page.encode('utf-8'))
+        self.assets = assets
+
+    def _make_asset(self, name, body):
+        variants = {'identity': body, 'gzip': gzip.compress(body, 9)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(body)
+        return {
+            'version': hashlib.sha256(body).hexdigest()[:16],
+            'mimetype': mimetypes.guess_type(name)[0] or 'application/octet-stream',
+            'variants': variants,
+        }
+
+class MediaIndex:
+    """Background images and videos in static/, with small generated thumbnails.
+
+    The directory listing is cached until the directory mtime changes, and
+    the files handed out are re-checked, since overwriting a file in place
+    leaves the directory mtime alone. Thumbnails (a scaled JPEG for images, a poster frame for videos) are
+    generated on first request and stored outside static/, keyed by the
+    file's name, size and mtime so a replaced file gets a new thumbnail.
+    """
+
+    def __init__(self, root, thumbnail_dir, size):
+        self.root = root
+        self.thumbnail_dir = thumbnail_dir
+        self.size = size
+        self.mtime = None
+        self.items = []
+        self.by_file = {}
+        self.ffmpeg = shutil.which('ffmpeg')
+        self.lock = threading.Lock()
+        self.generate_lock = threading.Lock()
+        os.makedirs(thumbnail_dir, exist_ok=True)
+
+    def list(self):
+        """Return every media item, rescanning only if the directory changed."""
+        mtime = os.stat(self.root).st_mtime_ns
+        with self.lock:
+            if mtime != self.mtime:
+                self._scan()
+                self.mtime = mtime
+            return self.items
+
+    def page(self, offset, limit):
+        """Return (items, total) for a slice of the listing, with up-to-date versions."""
+        items = self.list()
+        return [self._refresh(item) for item in items[offset:offset + limit]], len(items)
+
+    def get(self, file):
+        """Return the media item for a file name, or None."""
+        self.list()
+        item = self.by_file.get(file)
+        return self._refresh(item) if item is not None else None
+
+    def thumbnail(self, item):
+        """Return the thumbnail path for an item, generating it if needed, or None if it can't be made."""
+        path = os.path.join(self.thumbnail_dir, f"{item['version']}.jpg")
+        if os.path.exists(path):
+            return path
+        with self.generate_lock:
+            if os.path.exists(path):
+                return path
+            source = os.path.join(self.root, item['file'])
+            tmp_path = f'{path}.{uuid.uuid4().hex}.tmp.jpg'
+            try:
+                if item['type'] == 'image':
+                    made = self._image_thumbnail(source, tmp_path)
+                else:
+                    made = self._video_poster(source, tmp_path)
+                if not made:
+                    return None
+                os.replace(tmp_path, path)
+            except Exception as e:
+                print(f"Error making thumbnail for {item['file']}: {e}")
+                return None
+            finally:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+        return path
+
+    def _image_thumbnail(self, source, path):
+        if Image is None:
+            return False
+        with Image.open(source) as image:
+            image.thumbnail(self.size)
+            image.convert('RGB').save(path, 'JPEG', quality=80)
+        return True
+
+    def _video_poster(self, source, path):
+        if not self.ffmpeg:
+            return False
+        width, height = self.size
+        subprocess.run(
+            [self.ffmpeg, '-v', 'error', '-y', '-i', source, '-vf',
+             f'thumbnail,scale={width}:{height}:force_original_aspect_ratio=decrease',
+             '-frames:v', '1', path],
+            capture_output=True, check=True, timeout=60
+        )
+        return os.path.exists(path)
+
+    def _refresh(self, item):
+        try:
+            stat = os.stat(os.path.join(self.root, item['file']))
+        except OSError:
+            return item
+        with self.lock:
+            item['version'] = self._version(item['file'], stat)
+        return item
+
+    def _version(self, name, stat):
+        return hashlib.sha256(f'{name}:{stat.st_size}:{stat.st_mtime_ns}'.encode('utf-8')).hexdigest()[:16]
+
+    def _scan(self):
+        items = []
+        for entry in os.scandir(self.root):
+            name = entry.name.lower()
+            if not entry.is_file():
+                continue
+            if name.endswith(MEDIA_IMAGE_EXTENSIONS):
+                media_type = 'image'
+            elif name.endswith(MEDIA_VIDEO_EXTENSIONS):
+                media_type = 'video'
+            else:
+                continue
+            items.append({'type': media_type, 'file': entry.name, 'version': self._version(entry.name, entry.stat())})
+        items.sort(key=lambda item: item['file'].lower())
+        self.items = items
+        self.by_file = {item['file']: item for item in items}
+
+class SessionlessPaths(SessionInterface):
+    """Session interface that gives requests under some path prefixes no session at all.
+
+    Those requests skip reading the session file, can never write it back,
+    and leave no Set-Cookie or Vary: Cookie on responses meant to be cached
+    publicly. Everything else goes to the wrapped interface.
+    """
+
+    def __init__(self, inner, prefixes):
+        self.inner = inner
+        self.prefixes = tuple(prefixes)
+
+    def open_session(self, app, request):
+        if request.path.startswith(self.prefixes):
+            return self.make_null_session(app)
+        return self.inner.open_session(app, request)
+
+    def save_session(self, app, session, response):
+        # Flask never saves the null sessions handed out above
+        self.inner.save_session(app, session, response)
+
+audio_cache = AudioCache(AUDIO_CACHE_MAX_BYTES)
+audio_store = AudioStore(AUDIO_STORE_DIR, AUDIO_STORE_MAX_BYTES)
+atexit.register(audio_store.flush)
+backend_slots = {}  # Filled by register_tts_backend
+async_backend_slots = {}  # Created on first use by get_async_backend_slots
+synthesis_backoff = SynthesisBackoff()
+synthesis_flights = SingleFlight()
+synthesis_coordinator = SynthesisCoordinator(audio_store.db_path, SYNTHESIS_LEASE_SECONDS)
+navigation_settle = Debouncer()
+audio_readiness = AudioReadiness()
+preload_scheduler = PreloadScheduler()
+preload_window = PreloadWindow()
+document_store = DocumentStore(DOCUMENT_STORE_DIR, MAX_LOADED_DOCUMENTS)
+event_bus = EventBus()
+audio_cache.listeners.append(event_bus.cache_listener)
+pdf_pool = None
+pdf_pool_lock = threading.Lock()
+preloader_lock = threading.Lock()
+ui_bundle = UIBundle(UI_DIR)
+# Content-addressed audio and its long-polls never use the session
+app.session_interface = SessionlessPaths(app.session_interface, ('/audio/', '/audio_wait/'))
+media_index = MediaIndex(MEDIA_DIR, MEDIA_THUMBNAIL_DIR, MEDIA_THUMBNAIL_SIZE)
+
+def get_reader_id():
+    """Return the id identifying this browser session's reader."""
+    if 'reader_id' not in session:
+        session['reader_id'] = uuid.uuid4().hex
+    return session['reader_id']
+
+def make_snippet(phrase, search_string):
+    """Return the text around the first occurrence of search_string in a phrase."""
+    position = max(0, phrase.lower().find(search_string.lower()))
+    start = max(0, position - SNIPPET_RADIUS)
+    end = min(len(phrase), position + len(search_string) + SNIPPET_RADIUS)
+    snippet = ' '.join(phrase[start:end].split())
+    return ('…' if start > 0 else '') + snippet + ('…' if end < len(phrase) else '')
+
+def current_chapter(document, index):
+    """Return the position in document.chapters of the chapter containing a phrase, or None."""
+    position = bisect.bisect_right([start for start, _ in document.chapters], index) - 1
+    return position if position >= 0 else None
+
+def get_session_document():
+    """Return the document this session is reading, or None."""
+    doc_id = session.get('doc_id')
+    return document_store.get(doc_id) if doc_id else None
+
+def speech_text(phrases, index):
+    """Return a phrase as it is spoken, which is also what its audio digest is computed from."""
+    return phrases[index].replace("\n", " ").replace("  ", " ")
+
+def audio_key(doc_id, index):
+    """Build the audio cache key for a phrase of a document."""
+    return (doc_id, TTS_VOICE, index)
+
+def extract_pdf_page_range(path, start, stop):
+    """Extract the text of PDF pages [start, stop); runs in a worker process."""
+    reader = PyPDF2.PdfReader(path)
+    return [reader.pages[i].extract_text() or '' for i in range(start, stop)]
+
+def get_pdf_pool():
+    """Return the shared process pool used for PDF text extraction."""
+    global pdf_pool
+    with pdf_pool_lock:
+        if pdf_pool is None:
+            # Spawn rather than fork: this process has threads and open SQLite connections
+            pdf_pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return pdf_pool
+
+def iter_pdf_pages(path):
+    """Yield the text of each PDF page in order, extracting later pages in parallel."""
+    page_count = len(PyPDF2.PdfReader(path).pages)
+    if page_count == 0:
+        return
+
+    # The first page is extracted inline so reading can start right away
+    yield from extract_pdf_page_range(path, 0, 1)
+
+    futures = [
+        get_pdf_pool().submit(extract_pdf_page_range, path, start, min(start + PDF_PAGES_PER_TASK, page_count))
+        for start in range(1, page_count, PDF_PAGES_PER_TASK)
+    ]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+class HTMLTextExtractor(HTMLParser):
+    """Streaming HTML-to-text conversion that skips scripts and styles and notes the first heading and the title."""
+    SKIPPED_TAGS = {'script', 'style', 'template'}
+    HEADING_TAGS = {'h1', 'h2', 'h3'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipping = 0
+        self.heading = None
+        self.title = None
+        self.captured = None  # (tag, text parts) while inside the first heading or <title>
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self.skipping += 1
+        elif (tag in self.HEADING_TAGS and self.heading is None) or (tag == 'title' and self.title is None):
+            self.captured = (tag, [])
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS:
+            self.skipping = max(0, self.skipping - 1)
+        elif self.captured is not None and (tag in self.HEADING_TAGS or tag == 'title'):
+            text = ' '.join(''.join(self.captured[1]).split()) or None
+            if self.captured[0] == 'title':
+                self.title = text
+            else:
+                self.heading = text
+            self.captured = None
+
+    def handle_data(self, data):
+        if self.skipping:
+            return
+        self.parts.append(data)
+        if self.captured is not None:
+            self.captured[1].append(data)
+
+    def text(self):
+        return ''.join(self.parts)
+
+def html_to_text(html):
+    """Return the text content of an HTML document and its first h1-h3 heading, else its <title>."""
+    if isinstance(html, bytes):
+        html = html.decode('utf-8', errors='replace')
+    extractor = HTMLTextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return extractor.text(), extractor.heading or extractor.title
+
+def iter_epub_chapters(file):
+    """Yield (text, heading) for each EPUB chapter in spine order, parsing each only when reached.
+    
+    The heading is '' for a chapter without one, so it still starts a chapter.
+    """
     book = epub.read_epub(file)
-    text = ''
-    for item in book.get_items():
-        if item.get_type() == epub.EpubHtml:
-            soup = BeautifulSoup(item.get_content(), 'html.parser')
-            text += soup.get_text()
-    return text
+    for idref, _ in book.spine:
+        item = book.get_item_with_id(idref)
+        if item is not None and item.get_type() == ebooklib.ITEM_DOCUMENT:
+            text, heading = html_to_text(item.get_content())
+            yield text, heading or ''
 
 def extract_text_from_txt(file):
     """Extract text from a plain text file."""
@@ -62,1499 +1475,728 @@ def extract_text_from_txt(file):
 
 def split_into_phrases(text):
     """Split text into phrases based on commas and dots followed by whitespace."""
-    phrases = re.split(r'(?<=[.?!])\s+', text)
+    phrases = PHRASE_BOUNDARY.split(text)
     return [phrase.strip() for phrase in phrases if phrase.strip()]
 
+class PhraseSplitter:
+    """Incremental split_into_phrases: feed text piece by piece, get finished phrases back.
+
+    The trailing fragment of each piece is held back because the next piece may
+    continue the same sentence.
+    """
+
+    def __init__(self):
+        self.pending = ''
+
+    def feed(self, text):
+        parts = PHRASE_BOUNDARY.split(self.pending + text)
+        self.pending = parts.pop()
+        return [phrase.strip() for phrase in parts if phrase.strip()]
+
+    def finish(self):
+        rest, self.pending = self.pending.strip(), ''
+        return [rest] if rest else []
+
+def add_section(document, splitter, text, chapter=None):
+    """Append the phrases of one page, or of a chapter when chapter is a title ('' if it has none)."""
+    if chapter is None:
+        document.extend(splitter.feed(text))
+        return
+
+    # A chapter never shares a phrase with the one before it
+    document.extend(splitter.finish())
+    start = len(document.phrases)
+    document.extend(splitter.feed(text))
+    document.extend(splitter.finish())
+    if len(document.phrases) > start:
+        document.chapters.append([start, chapter or f'Chapter {len(document.chapters) + 1}'])
+
+def finish_ingestion(document, sections, splitter, source_path):
+    """Split the remaining sections of a document, then persist it and remove the upload."""
+    try:
+        checkpointed = time.monotonic()
+        for text, chapter in sections:
+            add_section(document, splitter, text, chapter)
+            if time.monotonic() - checkpointed >= DOCUMENT_CHECKPOINT_SECONDS:
+                document_store.checkpoint(document)
+                checkpointed = time.monotonic()
+        document.extend(splitter.finish())
+        document.complete = True
+        document_store.save(document)
+        event_bus.publish(document.doc_id, {'type': 'progress', 'total': len(document.phrases), 'loading': False})
+    except Exception as e:
+        # Keep what was indexed so far readable; it is saved as failed, so a re-upload retries
+        document.complete = True
+        document.failed = True
+        event_bus.publish(document.doc_id, {'type': 'progress', 'total': len(document.phrases), 'loading': False})
+        document_store.abandon(document)
+        print(f"Error indexing document {document.title}: {str(e)}")
+    finally:
+        os.unlink(source_path)
+
+def save_upload(file):
+    """Stream an upload to a temporary file, hashing it on the way; returns (path, sha256 hex digest)."""
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(file.filename)[1])
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: file.stream.read(UPLOAD_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                f.write(chunk)
+    except Exception:
+        os.unlink(path)
+        raise
+    return path, digest.hexdigest()
+
+def start_ingestion(doc_id, title, source_path):
+    """Index a saved upload far enough to start reading and finish the rest in the background."""
+    try:
+        # Extract (text, chapter title) sections by file type: PDF pages, EPUB chapters, whole TXT
+        if title.endswith('.pdf'):
+            sections = ((page_text, None) for page_text in iter_pdf_pages(source_path))
+        elif title.endswith('.epub'):
+            sections = iter_epub_chapters(source_path)
+        else:
+            with open(source_path, 'rb') as f:
+                sections = iter([(extract_text_from_txt(f), None)])
+        
+        document = Document(doc_id, title, [], complete=False)
+        splitter = PhraseSplitter()
+        
+        # Split just enough to start reading
+        for text, chapter in sections:
+            add_section(document, splitter, text, chapter)
+            if document.phrases:
+                break
+    except Exception:
+        os.unlink(source_path)
+        raise
+    
+    document_store.add(document)
+    if document.phrases:
+        # Other server processes can open it from the first phrases on
+        document_store.checkpoint(document)
+        threading.Thread(target=finish_ingestion, args=(document, sections, splitter, source_path), daemon=True).start()
+    else:
+        finish_ingestion(document, sections, splitter, source_path)
+    return document
+
 def clean_file_paths(text):
     """Remove 'file:///' and everything until '.htm' from the text."""
-    pattern = r'file:///.*?\.htm'
-    return re.sub(pattern, '', text)
+    return FILE_PATH_PATTERN.sub('', text)
 
 def make_words_clickable(phrase):
-    """Convert each word in a phrase to a clickable link for Google search."""
-    def replace_word(match):
-        word = match.group(0)
-        if len(word) > 2 and word.isalpha():  # Only alphabetic words longer than 2 chars
-            search_url = f"https://www.google.com/search?q=define+{word}"
-            return f'<span class="clickable-word" onclick="window.open(\'{search_url}\', \'_blank\')">{word}</span>'
-        return word
-
-    # Split on whitespace and preserve delimiters
-    parts = re.split(r'(\s+|[^\w\s]+)', phrase)
-    result = ''
-    for part in parts:
-        if part.strip() and part.isalpha():
-            # Process alphabetic words
-            result += re.sub(r'\b[a-zA-Z]+\b', replace_word, part)
-        else:
-            # Keep non-word parts (punctuation, spaces) unchanged
-            result += part
+    """Wrap each word in a compact span; one delegated click handler looks words up."""
+    parts = []
+    last = 0
+    for match in CLICKABLE_WORD.finditer(phrase):
+        # Keep non-word parts (punctuation, spaces), escaped for HTML
+        parts.append(html.escape(phrase[last:match.start()], quote=False))
+        parts.append(f'<span class="w">{match.group(0)}</span>')
+        last = match.end()
+    parts.append(html.escape(phrase[last:], quote=False))
+    return ''.join(parts)
+
+def render_phrases(phrases):
+    """Render a batch of phrases to clickable-word HTML."""
+    return [make_words_clickable(clean_file_paths(phrase)) for phrase in phrases]
+
+TTS_BACKENDS = {}
+tts_backend_instances = {}
+
+def register_tts_backend(name, concurrency=4):
+    """Class decorator that adds a TTS backend to the registry under a name.
+    
+    concurrency is how many calls the backend takes at once unless
+    TTS_BACKEND_CONCURRENCY says otherwise.
+    """
+    def decorator(cls):
+        cls.name = name
+        TTS_BACKENDS[name] = cls
+        limit = TTS_BACKEND_CONCURRENCY.setdefault(name, concurrency)
+        backend_slots[name] = threading.BoundedSemaphore(limit)
+        return cls
+    return decorator
+
+def get_tts_backend(name=None):
+    """Return the shared instance of a registered TTS backend (the configured one by default)."""
+    name = name or TTS_BACKEND
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"Unknown TTS backend '{name}'. Available: {', '.join(sorted(TTS_BACKENDS))}")
+    if name not in tts_backend_instances:
+        tts_backend_instances[name] = TTS_BACKENDS[name]()
+    return tts_backend_instances[name]
 
-    return result
+class TTSBackend:
+    """Base class for text-to-speech engines; subclasses return encoded audio bytes."""
+    name = None
+    mimetype = 'audio/mpeg'
 
-def generate_audio(phrase):
-    """Generate audio for a given phrase using gTTS."""
+    def synthesize(self, text, voice, slow):
+        raise NotImplementedError
+
+    async def synthesize_async(self, text, voice, slow):
+        """Event-loop synthesis; blocking engines run on the default executor unless overridden."""
+        return await asyncio.to_thread(self.synthesize, text, voice, slow)
+
+@register_tts_backend('gtts')
+class GTTSBackend(TTSBackend):
+    """Google Translate TTS; needs network access and is rate limited."""
+
+    def synthesize(self, text, voice, slow):
+        # Stream the MP3 straight into memory, no temporary file
+        audio_buffer = BytesIO()
+        gTTS(text=text, lang=voice, slow=slow).write_to_fp(audio_buffer)
+        return audio_buffer.getvalue()
+
+@register_tts_backend('espeak', concurrency=os.cpu_count() or 2)
+class EspeakBackend(TTSBackend):
+    """Offline engine that runs a local espeak-ng (or espeak) process and returns WAV audio."""
+    mimetype = 'audio/wav'
+
+    def __init__(self):
+        self.executable = shutil.which('espeak-ng') or shutil.which('espeak')
+
+    def synthesize(self, text, voice, slow):
+        if not self.executable:
+            raise RuntimeError('espeak-ng or espeak must be installed to use the espeak backend')
+        words_per_minute = '120' if slow else '175'
+        # The text goes in on stdin so a leading dash isn't taken for an option
+        result = subprocess.run(
+            [self.executable, '-v', voice, '-s', words_per_minute, '--stdout', '--stdin'],
+            input=text.encode('utf-8'), capture_output=True, check=True, timeout=60
+        )
+        return result.stdout
+
+    async def synthesize_async(self, text, voice, slow):
+        if not self.executable:
+            raise RuntimeError('espeak-ng or espeak must be installed to use the espeak backend')
+        words_per_minute = '120' if slow else '175'
+        process = await asyncio.create_subprocess_exec(
+            self.executable, '-v', voice, '-s', words_per_minute, '--stdout', '--stdin',
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(text.encode('utf-8')), 60)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, self.executable, stdout, stderr)
+        return stdout
+
+@register_tts_backend('fake', concurrency=64)
+class FakeBackend(TTSBackend):
+    """Deterministic backend producing silent MP3 frames, for offline tests and load testing."""
+
+    # MPEG-1 Layer III, 128 kbps, 44.1 kHz, mono; an all-zero body decodes as silence
+    FRAME_HEADER = struct.pack('>I', 0xFFFB90C4)
+    FRAME = FRAME_HEADER + bytes(417 - len(FRAME_HEADER))
+    FRAMES_PER_WORD = 10  # About a quarter of a second per word
+
+    def synthesize(self, text, voice, slow):
+        frames = max(1, len(text.split())) * self.FRAMES_PER_WORD
+        if slow:
+            frames *= 2
+        return self.FRAME * frames
+
+    async def synthesize_async(self, text, voice, slow):
+        return self.synthesize(text, voice, slow)
+
+def generate_audio(phrase, backend=None):
+    """Generate audio bytes for a given phrase with the configured TTS backend."""
     try:
         # Clean the phrase
         cleaned_phrase = clean_file_paths(phrase)
         
-        # Create a buffer to store audio data
-        audio_buffer = BytesIO()
-        
         # Generate the audio
-        tts = gTTS(text=cleaned_phrase, lang='en', slow=False)
-        
-        # Save the audio to a temporary file, then read it back
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as tmp_file:
-            tts.save(tmp_file.name)
-            tmp_file.close()
-            
-            # Read the audio file into the buffer
-            with open(tmp_file.name, 'rb') as f:
-                audio_buffer.write(f.read())
-            
-            # Clean up the temporary file
-            os.unlink(tmp_file.name)
-        
-        # Reset the buffer's position
-        audio_buffer.seek(0)
-        return audio_buffer
+        return get_tts_backend(backend).synthesize(cleaned_phrase, TTS_VOICE, TTS_SLOW)
     except Exception as e:
         raise Exception(f"Failed to generate audio: {str(e)}")
 
-def audio_preloader_worker():
-    """Worker thread that preloads audio in background."""
-    while not stop_generation_event.is_set():
-        try:
-            # Get a phrase from the queue
-            index, phrase = audio_generation_queue.get(timeout=1)
-            
-            # Skip if already cached
-            if index in audio_cache:
-                audio_generation_queue.task_done()
-                continue
-                
-            # Generate and cache the audio
-            audio_buffer = generate_audio(phrase)
-            audio_cache[index] = audio_buffer
-            
-            # Mark the task as done
-            audio_generation_queue.task_done()
-            
-            # Small pause to prevent overloading the system
-            time.sleep(0.1)
-            
-        except queue.Empty:
-            # Queue is empty, just continue
-            continue
-        except Exception as e:
-            # Log any errors
-            print(f"Error in preloader worker: {str(e)}")
-            if 'index' in locals():
-                audio_generation_queue.task_done()
-
-def manage_audio_cache(current_index, phrases):
-    """Manage the audio cache - keeping past items and scheduling future ones."""
-    
-    past_start = max(0, current_index - MAX_RETAINED_PAST)
-    past_end = current_index
-    future_start = current_index + 1
-    future_end = min(current_index + MAX_PRELOADED_FUTURE, len(phrases) - 1)
-    
-    # Determine valid indices to keep in cache
-    valid_indices = set(range(past_start, future_end + 1))
-    
-    # Clean up old cached audio
-    keys_to_remove = [k for k in audio_cache.keys() if k not in valid_indices]
-    for k in keys_to_remove:
-        del audio_cache[k]
-    
-    # Schedule future phrases for preloading
-    for i in range(future_start, future_end + 1):
-        if i not in audio_cache:  
-            phrase = phrases[i].replace("\n", " ").replace("  ", " ")
-            audio_generation_queue.put((i, phrase))
-
-def get_audio_for_phrase(index, phrases):
-    """Helper function to get audio for a specific phrase."""
-    
-    if index in audio_cache:
-        # Use cached audio if available
-        audio_data = audio_cache[index].getvalue()
-        audio_buffer = BytesIO(audio_data)
-    else:
-        # Generate audio if not cached
-        phrase = phrases[index].replace("\n", " ").replace("  ", " ")
-        try:
-            audio_buffer = generate_audio(phrase)
-            # Cache the audio for future use
-            audio_cache[index] = BytesIO(audio_buffer.getvalue())
-        except Exception as e:
-            raise Exception(f"Failed to generate audio: {str(e)}")
-    
-    return audio_buffer
-
-@app.route('/')
-def index():
-    """Serve the main HTML page with improved UI focusing on the text."""
-    return '''
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Immersive Document Reader</title>
-        <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
-        <style>
-            :root {
-                --bg-color: #121212;
-                --surface-color: #1e1e1e;
-                --surface-lighter: #2d2d2d;
-                --primary-color: #bb86fc;
-                --secondary-color: #03dac6;
-                --text-color: #e0e0e0;
-                --muted-color: #9e9e9e;
-                --error-color: #cf6679;
-                --shadow-color: rgba(0, 0, 0, 0.5);
-            }
-            
-            * {
-                margin: 0;
-                padding: 0;
-                box-sizing: border-box;
-                transition: all 0.3s ease;
-            }
-            
-            body {
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                background-image: url('/static/image.png'); /* Adjust the path and filename as needed */
-                background-size: cover; /* Ensures the image covers the entire area */
-                background-position: center; /* Centers the image */
-                background-repeat: no-repeat; /* Prevents tiling */
-                background-attachment: fixed; /* Keeps the background fixed during scroll */
-                color: var(--text-color);
-                min-height: 100vh;
-                display: flex;
-                flex-direction: column;
-                overflow-x: hidden;
-            }
-            
-            header {
-                backdrop-filter: blur(20px);
-                -webkit-backdrop-filter: blur(20px);
-                padding: 1rem;
-                box-shadow: 0 2px 10px var(--shadow-color);
-                z-index: 10;
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-            }
-            
-            .app-title {
-                font-size: 1.5rem;
-                font-weight: 300;
-                letter-spacing: 1px;
-                margin: 0;
-                color: var(--primary-color);
-            }
-            
-            .controls-toggle {
-                background-color: transparent;
-                border: none;
-                color: var(--text-color);
-                font-size: 1.2rem;
-                cursor: pointer;
-                padding: 0.5rem;
-                border-radius: 50%;
-            }
-            
-            .controls-toggle:hover {
-                background-color: var(--surface-lighter);
-            }
-            
-            main {
-                flex: 1;
-                display: flex;
-                flex-direction: column;
-                align-items: center;
-                justify-content: center;
-                padding: 2rem;
-                position: relative;
-            }
-            
-            .text-display {
-                width: 100%;
-                max-width: 800px;
-                min-height: 50vh;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                text-align: center;
-                font-size: 2rem;
-                line-height: 1.5;
-                font-weight: 300;
-                padding: 2rem;
-                position: relative;
-                z-index: 1;
-            }
-            
-            .text-content {
-                opacity: 1;
-                transform: translateY(0);
-            }
-            
-            .fade {
-                opacity: 0;
-                transform: translateY(20px);
-            }
-            
-            .clickable-word {
-                color: var(--text-color);
-                cursor: pointer;
-                position: relative;
-                display: inline-block;
-            }
-            
-            .clickable-word:hover {
-                text-decoration: underline;
-                background-color: rgba(187, 134, 252, 0.1);
-                border-radius: 3px;
-            }
-            
-            .clickable-word:after {
-                content: '🔍';
-                font-size: 0.7em;
-                position: absolute;
-                top: -0.7em;
-                right: -0.5em;
-                opacity: 0;
-                transition: opacity 0.2s ease;
-            }
-            
-            .clickable-word:hover:after {
-                opacity: 1;
-            }
-            
-            .controls-panel {
-                position: fixed;
-                top: 0;
-                right: -350px;
-                height: 100vh;
-                width: 350px;
-                background-color: var(--surface-color);
-                box-shadow: -5px 0 15px var(--shadow-color);
-                padding: 1.5rem;
-                overflow-y: auto;
-                z-index: 100;
-                display: flex;
-                flex-direction: column;
-            }
-            
-            .controls-panel.visible {
-                right: 0;
-            }
-            
-            .controls-section {
-                margin-bottom: 2rem;
-            }
-            
-            .section-title {
-                font-size: 1rem;
-                font-weight: 500;
-                margin-bottom: 1rem;
-                color: var(--primary-color);
-                text-transform: uppercase;
-                letter-spacing: 1px;
-            }
-            
-            input[type="file"] {
-                display: none;
-            }
-            
-            .file-upload-label {
-                display: block;
-                background-color: var(--primary-color);
-                color: var(--bg-color);
-                text-align: center;
-                padding: 0.8rem;
-                border-radius: 4px;
-                cursor: pointer;
-                font-weight: 500;
-                margin-bottom: 1rem;
-            }
-            
-            .file-upload-label:hover {
-                background-color: #9965dd;
-            }
-            
-            .upload-btn {
-                width: 100%;
-                background-color: var(--secondary-color);
-                color: var(--bg-color);
-                border: none;
-                padding: 0.8rem;
-                border-radius: 4px;
-                cursor: pointer;
-                font-weight: 500;
-            }
-            
-            .upload-btn:disabled {
-                background-color: var(--surface-lighter);
-                color: var(--muted-color);
-                cursor: not-allowed;
-            }
-            
-            .upload-btn:hover:not(:disabled) {
-                background-color: #02c4b0;
-            }
-            
-            .search-container {
-                display: flex;
-                margin-bottom: 1rem;
-            }
-            
-            .search-input {
-                flex: 1;
-                background-color: var(--surface-lighter);
-                border: 1px solid var(--muted-color);
-                color: var(--text-color);
-                padding: 0.8rem;
-                border-radius: 4px 0 0 4px;
-            }
-            
-            .search-btn {
-                background-color: var(--primary-color);
-                color: var(--bg-color);
-                border: none;
-                padding: 0.8rem 1rem;
-                border-radius: 0 4px 4px 0;
-                cursor: pointer;
-            }
-            
-            .search-btn:hover {
-                background-color: #9965dd;
-            }
-            
-            .document-info {
-                display: flex;
-                align-items: center;
-                justify-content: space-between;
-                background-color: var(--surface-lighter);
-                padding: 0.8rem;
-                border-radius: 4px;
-                margin-bottom: 1rem;
-            }
-            
-            .document-title {
-                font-weight: 500;
-                word-break: break-all;
-            }
-            
-            .unload-btn {
-                background-color: var(--error-color);
-                color: var(--bg-color);
-                border: none;
-                width: 30px;
-                height: 30px;
-                border-radius: 50%;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                cursor: pointer;
-                margin-left: 0.5rem;
-            }
-            
-            .unload-btn:hover {
-                background-color: #b5596a;
-            }
-            
-            .navigation-controls {
-                display: flex;
-                justify-content: center;
-                gap: 1rem;
-                margin-top: 2rem;
-            }
-            
-            .nav-btn {
-                background-color: var(--surface-lighter);
-                color: var(--text-color);
-                border: none;
-                width: 50px;
-                height: 50px;
-                border-radius: 50%;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                cursor: pointer;
-                font-size: 1.2rem;
-            }
-            
-            .nav-btn:hover {
-                background-color: var(--primary-color);
-                color: var(--bg-color);
-            }
-            
-            .spinner-container {
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                padding: 1rem;
-            }
-            
-            .spinner {
-                border: 3px solid var(--surface-lighter);
-                border-top: 3px solid var(--primary-color);
-                border-radius: 50%;
-                width: 30px;
-                height: 30px;
-                animation: spin 1s linear infinite;
-                margin-right: 1rem;
-            }
-            
-            @keyframes spin {
-                0% { transform: rotate(0deg); }
-                100% { transform: rotate(360deg); }
-            }
-            
-            .preload-status {
-                background-color: var(--surface-lighter);
-                border-radius: 4px;
-                padding: 1rem;
-            }
-            
-            .preload-container {
-                display: flex;
-                flex-wrap: wrap;
-                justify-content: center;
-                margin-top: 0.5rem;
-            }
-            
-            .preload-section {
-                margin: 0 10px;
-            }
-            
-            .preload-section-title {
-                font-size: 0.75rem;
-                margin-bottom: 5px;
-                color: var(--muted-color);
-            }
-            
-            .preload-indicator {
-                display: inline-block;
-                width: 10px;
-                height: 10px;
-                border-radius: 50%;
-                margin: 2px;
-                background-color: var(--surface-color);
-            }
-            
-            .preload-loaded {
-                background-color: var(--secondary-color);
-            }
-            
-            .preload-current {
-                background-color: var(--primary-color);
-            }
-            
-            .preload-past {
-                background-color: #03a9f4;
-            }
-            
-            .preload-stats {
-                font-size: 0.75rem;
-                margin-top: 0.5rem;
-                color: var(--muted-color);
-                text-align: center;
-            }
-            
-            .overlay {
-                position: fixed;
-                top: 0;
-                left: 0;
-                right: 0;
-                bottom: 0;
-                background-color: rgba(0, 0, 0, 0.5);
-                z-index: 50;
-                opacity: 0;
-                pointer-events: none;
-                transition: opacity 0.3s ease;
-            }
-            
-            .overlay.visible {
-                opacity: 1;
-                pointer-events: auto;
-            }
-            
-            .hidden {
-                display: none;
-            }
-            
-            /* Progress bar */
-            .progress-container {
-                position: fixed;
-                bottom: 0;
-                left: 0;
-                width: 100%;
-                height: 5px;
-                backdrop-filter: blur(20px);
-                z-index: 5;
-            }
-            
-            .progress-bar {
-                height: 100%;
-                background-color: var(--primary-color);
-                width: 0%;
-                transition: width 0.3s ease;
-            }
-            
-            .keyboard-shortcuts {
-                padding: 1rem;
-                background-color: var(--surface-lighter);
-                border-radius: 4px;
-                margin-top: 1rem;
-            }
-            
-            .shortcuts-title {
-                font-size: 0.9rem;
-                color: var(--primary-color);
-                margin-bottom: 0.5rem;
-            }
-            
-            .shortcut-item {
-                display: flex;
-                justify-content: space-between;
-                margin: 0.5rem 0;
-            }
-            
-            .key {
-                background-color: var(--surface-color);
-                padding: 0.2rem 0.5rem;
-                border-radius: 3px;
-                font-family: monospace;
-            }
-            
-            .reading-history {
-                margin-top: 1rem;
-                padding: 1rem;
-                background-color: var(--surface-lighter);
-                border-radius: 4px;
-            }
-            
-            .history-title {
-                font-size: 0.9rem;
-                color: var(--primary-color);
-                margin-bottom: 0.5rem;
-            }
-            
-            .audio-control-btn {
-                width: 50px;
-                height: 50px;
-                border-radius: 50%;
-                background-color: var(--primary-color);
-                color: var(--bg-color);
-                border: none;
-                font-size: 1.2rem;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                cursor: pointer;
-                margin: 0 0.5rem;
-            }
-            
-            .audio-control-btn:hover {
-                background-color: #9965dd;
-            }
-            
-            /* Fade in animation for the main content */
-            @keyframes fadeIn {
-                from { opacity: 0; transform: translateY(20px); }
-                to { opacity: 1; transform: translateY(0); }
-            }
-            
-            .fade-in {
-                animation: fadeIn 0.5s ease forwards;
-            }
-            
-            /* Responsive design */
-            @media (max-width: 768px) {
-                .controls-panel {
-                    width: 280px;
-                }
-                
-                .text-display {
-                    font-size: 1.5rem;
-                    padding: 1rem;
-                }
-            }
+async def generate_audio_async(phrase, backend=None):
+    """Async counterpart of generate_audio, for the event-loop serving mode."""
+    try:
+        cleaned_phrase = clean_file_paths(phrase)
+        return await get_tts_backend(backend).synthesize_async(cleaned_phrase, TTS_VOICE, TTS_SLOW)
+    except Exception as e:
+        raise Exception(f"Failed to generate audio: {str(e)}")
 
-            .media-grid {
-                display: grid;
-                grid-template-columns: repeat(2, 1fr);
-                gap: 10px;
-            }
+def parse_mp3_frames(audio_data):
+    """Strip ID3 tags and Xing/Info headers from an MP3 clip.
 
-            .media-item {
-                position: relative;
-                width: 100%;
-                height: 100px;
-                overflow: hidden;
-                cursor: pointer;
-            }
+    Returns the bare audio frames, which can be concatenated with other clips,
+    and their playing time in seconds.
+    """
+    position = 0
+    if audio_data[:3] == b'ID3' and len(audio_data) >= 10:
+        # ID3v2 size is a 28-bit synchsafe integer, plus a footer if flagged
+        size = (audio_data[6] << 21) | (audio_data[7] << 14) | (audio_data[8] << 7) | audio_data[9]
+        position = 10 + size + (10 if audio_data[5] & 0x10 else 0)
 
-            .media-item img, .media-item video {
-                width: 100%;
-                height: 100%;
-                object-fit: cover;
-            }
+    frames = []
+    duration = 0.0
+    while position + 4 <= len(audio_data):
+        b1, b2 = audio_data[position + 1], audio_data[position + 2]
+        version = (b1 >> 3) & 0x03
+        bitrate_index = b2 >> 4
+        sample_rate_index = (b2 >> 2) & 0x03
+        if (audio_data[position] != 0xFF or (b1 & 0xE0) != 0xE0 or version == 1
+                or (b1 >> 1) & 0x03 != 1 or bitrate_index in (0, 15) or sample_rate_index == 3):
+            # Not a Layer III frame header (an ID3v1 tag or junk); resync
+            position += 1
+            continue
 
-            .media-item.selected {
-                border: 2px solid var(--primary-color);
-            }
+        bitrates = MP3_BITRATES['mpeg1' if version == 3 else 'mpeg2']
+        sample_rate = MP3_SAMPLE_RATES[version][sample_rate_index]
+        samples = 1152 if version == 3 else 576
+        length = samples // 8 * bitrates[bitrate_index] * 1000 // sample_rate + ((b2 >> 1) & 0x01)
+        frame = audio_data[position:position + length]
+        position += length
+        if b'Xing' in frame[:64] or b'Info' in frame[:64] or b'VBRI' in frame[:64]:
+            # Encoder metadata frame; it would play as a glitch mid-stream
+            continue
+        frames.append(frame)
+        duration += samples / sample_rate
+    return b''.join(frames), duration
 
-            .video-icon {
-                position: absolute;
-                top: 50%;
-                left: 50%;
-                transform: translate(-50%, -50%);
-                color: white;
-                font-size: 24px;
-                pointer-events: none;
-            }
-            #background-video {
-                position: fixed;
-                top: 0;
-                left: 0;
-                width: 100%;
-                height: 100%;
-                object-fit: cover;
-                z-index: -1;
-            }
-            body {
-                margin: 0;
-                background-color: #000; /* Fallback in case video fails */
-            }
+def audio_mimetype(audio_data):
+    """Tell a clip's type from its first bytes; it may come from a backend other than the current one."""
+    if audio_data[:4] == b'RIFF':
+        return 'audio/wav'
+    return 'audio/mpeg'
 
-            .reading-mode-controls {
-                display: flex;
-                flex-direction: column;
-                gap: 1rem;
-                padding: 1rem;
-                background-color: var(--surface-lighter);
-                border-radius: 4px;
-            }
+def audio_digest(phrase):
+    """Hash the cleaned phrase text together with the TTS parameters."""
+    cleaned_phrase = ' '.join(clean_file_paths(phrase).split())
+    params = json.dumps([TTS_BACKEND, TTS_VOICE, TTS_SLOW, cleaned_phrase])
+    return hashlib.sha256(params.encode('utf-8')).hexdigest()
 
-            .toggle-switch {
-                position: relative;
-                display: inline-flex;
-                align-items: center;
-                cursor: pointer;
-            }
+def claim_synthesis(digest):
+    """Blocking first step of making a clip: return (audio_data, claimed).
 
-            .toggle-switch input {
-                opacity: 0;
-                width: 0;
-                height: 0;
-            }
+    audio_data is the clip if it is already stored. Otherwise claimed says
+    whether this process now holds the claim and should call the backend,
+    or another process is making it.
+    """
+    audio_data = audio_store.get(digest)
+    if audio_data is not None:
+        return audio_data, False
+    if not synthesis_coordinator.claim(digest):
+        return None, False
+    # It may have been stored between the first look and the claim
+    audio_data = audio_store.get(digest)
+    if audio_data is not None:
+        synthesis_coordinator.finish(digest)
+    return audio_data, True
 
-            .toggle-slider {
-                position: relative;
-                display: inline-block;
-                width: 50px;
-                height: 24px;
-                background-color: var(--surface-color);
-                border-radius: 12px;
-                margin-right: 10px;
-                transition: 0.3s;
-            }
+def store_synthesis(digest, audio_data):
+    """Store a clip this process made and release its claim."""
+    audio_store.put(digest, audio_data)
+    synthesis_coordinator.finish(digest)
 
-            .toggle-slider:before {
-                position: absolute;
-                content: "";
-                height: 20px;
-                width: 20px;
-                left: 2px;
-                bottom: 2px;
-                background-color: var(--text-color);
-                border-radius: 50%;
-                transition: 0.3s;
-            }
+def fail_synthesis(digest, error):
+    """Record a failed attempt at a clip for waiters in this process and the others."""
+    synthesis_coordinator.fail(digest, error)
+    audio_readiness.fail(digest, error)
 
-            .toggle-switch input:checked + .toggle-slider {
-                background-color: var(--primary-color);
-            }
+def poll_other_process(digest):
+    """Look once at another process's claim on a digest: (True, audio or None) once it is settled, else (False, None)."""
+    # Check the claim before the store; a finished claim means the file is already there
+    status, error = synthesis_coordinator.status(digest)
+    audio_data = audio_store.get(digest)
+    if audio_data is not None:
+        return True, audio_data
+    if status == 'failed':
+        raise Exception(error)
+    return status is None, None
 
-            .toggle-switch input:checked + .toggle-slider:before {
-                transform: translateX(26px);
-            }
+def wait_for_other_process(digest):
+    """Wait out another process's claim on a digest: its audio, or None once nobody holds the claim."""
+    while True:
+        settled, audio_data = poll_other_process(digest)
+        if settled:
+            return audio_data
+        time.sleep(STORE_POLL_SECONDS)
 
-            .toggle-label {
-                color: var(--text-color);
-                font-size: 0.9rem;
-            }
+async def wait_for_other_process_async(digest):
+    """wait_for_other_process for event-loop callers."""
+    while True:
+        settled, audio_data = await asyncio.to_thread(poll_other_process, digest)
+        if settled:
+            return audio_data
+        await asyncio.sleep(STORE_POLL_SECONDS)
 
-            .control-btn {
-                background-color: var(--primary-color);
-                color: var(--bg-color);
-                border: none;
-                padding: 0.8rem;
-                border-radius: 4px;
-                cursor: pointer;
-                font-weight: 500;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                gap: 0.5rem;
-                transition: background-color 0.3s ease;
-            }
+def load_or_generate_audio(phrase):
+    """Return audio for a phrase from the disk store, synthesizing it on a miss.
 
-            .control-btn:hover {
-                background-color: #9965dd;
-            }
-        </style>
-    </head>
-    <body>
-        <video id="background-video" autoplay muted>
-            <source src="your-video.mp4" type="video/mp4">
-            Your browser does not support the video tag.
-        </video>
-        <header>
-            <h1 class="app-title">Immersive Reader</h1>
-            <button id="controlsToggle" class="controls-toggle">
-                <i class="fas fa-cog"></i>
-            </button>
-        </header>
-        
-        <main>
-            <div class="text-display" id="textDisplay">
-                <div class="text-content" id="currentPhrase">
-                    Upload a document and search for text to begin reading.
-                </div>
-            </div>
-            
-            <div class="navigation-controls hidden" id="navigationControls">
-                <button class="nav-btn" onclick="prevPhrase()" title="Previous (Left Arrow)">
-                    <i class="fas fa-chevron-left"></i>
-                </button>
-                <button class="nav-btn" onclick="togglePlayPause()" title="Play/Pause (Space)" id="playPauseBtn">
-                    <i class="fas fa-pause"></i>
-                </button>
-                <button class="nav-btn" onclick="replayPhrase()" title="Replay (Up Arrow)">
-                    <i class="fas fa-redo"></i>
-                </button>
-                <button class="nav-btn" onclick="nextPhrase()" title="Next (Right Arrow)">
-                    <i class="fas fa-chevron-right"></i>
-                </button>
-            </div>
-        </main>
-        
-        <div class="progress-container">
-            <div class="progress-bar" id="progressBar"></div>
-        </div>
-        
-        <div class="controls-panel" id="controlsPanel">
-            <div class="controls-section">
-                <h2 class="section-title">Document</h2>
-                <div id="uploadSection">
-                    <label for="fileInput" class="file-upload-label">
-                        <i class="fas fa-file-upload"></i> Choose File
-                    </label>
-                    <input type="file" id="fileInput" accept=".pdf,.epub,.txt">
-                    <button id="uploadBtn" class="upload-btn" onclick="uploadFile()">Upload</button>
-                </div>
-                
-                <div id="documentInfo" class="document-info hidden">
-                    <span id="title" class="document-title"></span>
-                    <button class="unload-btn" onclick="unloadFile()">
-                        <i class="fas fa-times"></i>
-                    </button>
-                </div>
-                
-                <div id="spinner" class="spinner-container hidden">
-                    <div class="spinner"></div>
-                    <span>Processing...</span>
-                </div>
-            </div>
-            
-            <div id="searchSection" class="controls-section hidden">
-                <h2 class="section-title">Navigation</h2>
-                <div class="search-container">
-                    <input type="text" id="searchInput" class="search-input" placeholder="Search for text...">
-                    <button class="search-btn" onclick="search()">
-                        <i class="fas fa-search"></i>
-                    </button>
-                </div>
-            </div>
-            
-            <div id="audioSpinner" class="spinner-container hidden">
-                <div class="spinner"></div>
-                <span>Generating audio...</span>
-            </div>
-            
-            <div id="preloadStatus" class="preload-status hidden">
-                <div>Audio Cache Status:</div>
-                <div class="preload-container">
-                    <div class="preload-section" id="pastSection">
-                        <div class="preload-section-title">Previous</div>
-                        <div id="pastIndicators"></div>
-                    </div>
-                    <div class="preload-section">
-                        <div class="preload-section-title">Current</div>
-                        <div id="currentIndicator"></div>
-                    </div>
-                    <div class="preload-section" id="futureSection">
-                        <div class="preload-section-title">Next</div>
-                        <div id="futureIndicators"></div>
-                    </div>
-                </div>
-                <div class="preload-stats" id="cacheStats"></div>
-            </div>
-            
-            <div class="controls-section">
-                <h2 class="section-title">Reading Mode</h2>
-                <div class="reading-mode-controls">
-                    <label class="toggle-switch">
-                        <input type="checkbox" id="silentModeToggle">
-                        <span class="toggle-slider"></span>
-                        <span class="toggle-label">Silent Reading Mode</span>
-                    </label>
-                    <button id="startFromBeginning" class="control-btn">
-                        <i class="fas fa-redo"></i> Start from Beginning
-                    </button>
-                </div>
-            </div>
-            
-            <div class="controls-section">
-                <h2 class="section-title">Background Media</h2>
-                <div id="mediaGrid" class="media-grid"></div>
-            </div>
-        </div>
-        
-        <div class="overlay" id="overlay"></div>
-        <script>
-            let currentAudio = null;
-            let preloadedStatus = {};
-            let controlsVisible = false;
-            let isPlaying = false;
-            let currentFilePath = null;
-            let currentMedia = { type: 'image', file: 'image.png' }; // Default background
-            let isSilentMode = false;
-            
-            // Toggle controls panel
-            function toggleControls() {
-                const controlsPanel = document.getElementById('controlsPanel');
-                const overlay = document.getElementById('overlay');
-                
-                controlsVisible = !controlsVisible;
-                
-                if (controlsVisible) {
-                    controlsPanel.classList.add('visible');
-                    overlay.classList.add('visible');
-                } else {
-                    controlsPanel.classList.remove('visible');
-                    overlay.classList.remove('visible');
-                }
-            }
-            
-            // Handle text transitions with clickable words
-            function updateText(text) {
-                const textContent = document.getElementById('currentPhrase');
-                const textDisplay = document.getElementById('textDisplay');
-
-                // Apply fade out
-                textContent.classList.add('fade');
-
-                // After fade out, update text and fade in
-                setTimeout(() => {
-                    textContent.innerHTML = text;
-                    textContent.classList.remove('fade');
-                }, 300);
-            }
-            
-            // Update progress bar
-            function updateProgressBar(currentIndex, totalPhrases) {
-                const progressBar = document.getElementById('progressBar');
-                const percentage = (currentIndex / (totalPhrases - 1)) * 100;
-                progressBar.style.width = `${percentage}%`;
-            }
-            
-            // Play audio function
-            async function playAudio(url) {
-                if (currentAudio) {
-                    currentAudio.pause();
-                    currentAudio.currentTime = 0;
-                }
-                
-                currentAudio = new Audio(url);
-                
-                currentAudio.addEventListener('playing', () => {
-                    document.getElementById('audioSpinner').classList.add('hidden');
-                    document.getElementById('playPauseBtn').innerHTML = '<i class="fas fa-pause"></i>';
-                    isPlaying = true;
-                });
-                
-                currentAudio.addEventListener('ended', () => {
-                    document.getElementById('playPauseBtn').innerHTML = '<i class="fas fa-play"></i>';
-                    isPlaying = false;
-                });
-                
-                currentAudio.addEventListener('error', () => {
-                    document.getElementById('audioSpinner').classList.add('hidden');
-                    alert('Error playing audio');
-                    isPlaying = false;
-                });
-                
-                try {
-                    await currentAudio.play();
-                } catch (err) {
-                    console.error('Audio playback error:', err);
-                    document.getElementById('audioSpinner').classList.add('hidden');
-                    alert('Error playing audio. Try again or reload the page.');
-                    isPlaying = false;
-                }
-            }
-            
-            // Toggle play/pause
-            function togglePlayPause() {
-                if (!currentAudio) return;
-                
-                if (isPlaying) {
-                    currentAudio.pause();
-                    document.getElementById('playPauseBtn').innerHTML = '<i class="fas fa-play"></i>';
-                    isPlaying = false;
-                } else {
-                    currentAudio.play();
-                    document.getElementById('playPauseBtn').innerHTML = '<i class="fas fa-pause"></i>';
-                    isPlaying = true;
-                }
-            }
-            
-            async function uploadFile() {
-                const fileInput = document.getElementById('fileInput');
-                const file = fileInput.files[0];
-                
-                if (!file) {
-                    alert('Please select a file');
-                    return;
-                }
-                
-                const uploadButton = document.getElementById('uploadBtn');
-                uploadButton.disabled = true;
-                
-                const spinner = document.getElementById('spinner');
-                spinner.classList.remove('hidden');
-                
-                const formData = new FormData();
-                formData.append('file', file);
-                
-                try {
-                    const response = await fetch('/upload', {
-                        method: 'POST',
-                        body: formData
-                    });
-                    
-                    const result = await response.json();
-                    
-                    if (result.title) {
-                        document.getElementById('title').textContent = result.title;
-                        document.getElementById('documentInfo').classList.remove('hidden');
-                        document.getElementById('searchSection').classList.remove('hidden');
-                        document.getElementById('navigationControls').classList.remove('hidden');
-                        
-                        // Get the current phrase and audio
-                        const phraseResponse = await fetch('/get_current_phrase');
-                        const phraseData = await phraseResponse.json();
-                        if (phraseData.phrase) {
-                            updateText(phraseData.phrase);
-                        }
-                        
-                        if (!isSilentMode) {
-                            const audioResponse = await fetch('/get_current_audio');
-                            if (audioResponse.ok) {
-                                const blob = await audioResponse.blob();
-                                const url = URL.createObjectURL(blob);
-                                playAudio(url);
-                            }
-                        }
-                        
-                        updatePreloadStatus();
-                    } else {
-                        alert('Error: ' + result.error);
-                    }
-                } catch (error) {
-                    alert('Upload failed: ' + error.message);
-                } finally {
-                    spinner.classList.add('hidden');
-                    uploadButton.disabled = false;
-                }
-            }
-            
-            function unloadFile() {
-                fetch('/unload', { method: 'POST' });
-                document.getElementById('documentInfo').classList.add('hidden');
-                document.getElementById('searchSection').classList.add('hidden');
-                document.getElementById('navigationControls').classList.add('hidden');
-                document.getElementById('audioSpinner').classList.add('hidden');
-                document.getElementById('preloadStatus').classList.add('hidden');
-                document.getElementById('fileInput').value = '';
-                document.getElementById('progressBar').style.width = '0%';
-                updateText('Upload a document and search for text to begin reading.');
-                preloadedStatus = {};
-                currentFilePath = null;
-                if (currentAudio) {
-                    currentAudio.pause();
-                    currentAudio = null;
-                }
-                isPlaying = false;
-            }
-            
-            async function updatePreloadStatus() {
-                try {
-                    const response = await fetch('/preload_status');
-                    const status = await response.json();
-                    
-                    if (Object.keys(status).length > 0) {
-                        // Show the preload status section
-                        const preloadStatusEl = document.getElementById('preloadStatus');
-                        const pastIndicatorsEl = document.getElementById('pastIndicators');
-                        const currentIndicatorEl = document.getElementById('currentIndicator');
-                        const futureIndicatorsEl = document.getElementById('futureIndicators');
-                        const statsEl = document.getElementById('cacheStats');
-                        
-                        preloadStatusEl.classList.remove('hidden');
-                        
-                        // Clear previous indicators
-                        pastIndicatorsEl.innerHTML = '';
-                        currentIndicatorEl.innerHTML = '';
-                        futureIndicatorsEl.innerHTML = '';
-                        
-                        const currentIndex = status.current_index;
-                        const cachedIndices = status.cached || [];
-                        const totalPhrases = status.total_phrases || 0;
-                        
-                        // Update progress bar
-                        updateProgressBar(currentIndex, totalPhrases);
-                        
-                        // Create past indicators (up to 20)
-                        const pastStart = Math.max(0, currentIndex - 10);
-                        for (let i = pastStart; i < currentIndex; i++) {
-                            const dot = document.createElement('div');
-                            dot.className = 'preload-indicator';
-                            if (cachedIndices.includes(i)) {
-                                dot.classList.add('preload-past');
-                                dot.title = `Cached: ${i}`;
-                            } else {
-                                dot.title = `Not cached: ${i}`;
-                            }
-                            pastIndicatorsEl.appendChild(dot);
-                        }
-                        
-                        // Create current indicator
-                        const currentDot = document.createElement('div');
-                        currentDot.className = 'preload-indicator preload-current';
-                        currentDot.title = `Current: ${currentIndex}`;
-                        currentIndicatorEl.appendChild(currentDot);
-                        
-                        // Create future indicators (up to 20 for better display)
-                        const futureEnd = Math.min(currentIndex + 20, totalPhrases);
-                        for (let i = currentIndex + 1; i <= futureEnd; i++) {
-                            const dot = document.createElement('div');
-                            dot.className = 'preload-indicator';
-                            if (cachedIndices.includes(i)) {
-                                dot.classList.add('preload-loaded');
-                                dot.title = `Cached: ${i}`;
-                            } else {
-                                dot.title = `Not cached: ${i}`;
-                            }
-                            futureIndicatorsEl.appendChild(dot);
-                        }
-                        
-                        // Update stats
-                        statsEl.textContent = `Position: ${currentIndex + 1} of ${totalPhrases} | Cached: ${cachedIndices.length} phrases`;
-                        
-                        preloadedStatus = status;
-                    }
-                } catch (error) {
-                    console.error('Error updating preload status:', error);
-                }
-            }
-            
-            async function search() {
-                const searchInput = document.getElementById('searchInput');
-                const query = searchInput.value.trim();
-                
-                if (!query) {
-                    alert('Please enter a search term');
-                    return;
-                }
-                
-                const spinner = document.getElementById('audioSpinner');
-                spinner.classList.remove('hidden');
-                
-                try {
-                    const searchResponse = await fetch('/search', {
-                        method: 'POST',
-                        headers: {
-                            'Content-Type': 'application/json'
-                        },
-                        body: JSON.stringify({ search_string: query })
-                    });
-                    
-                    const searchResult = await searchResponse.json();
-                    
-                    if (searchResult.success) {
-                        // Get the current phrase text to display
-                        const phraseResponse = await fetch('/get_current_phrase');
-                        const phraseData = await phraseResponse.json();
-                        
-                        if (phraseData.phrase) {
-                            document.getElementById('navigationControls').classList.remove('hidden');
-                            updateText(phraseData.phrase);
-                            
-                            // Get and play the audio
-                            if (!isSilentMode) {
-                                const audioResponse = await fetch('/get_current_audio');
-                                if (audioResponse.ok) {
-                                    const blob = await audioResponse.blob();
-                                    const url = URL.createObjectURL(blob);
-                                    playAudio(url);
-                                }
-                            }
-                            
-                            updatePreloadStatus();
-                        }
-                    } else {
-                        spinner.classList.add('hidden');
-                        alert('Error: ' + (searchResult.error || 'Search failed'));
-                    }
-                } catch (error) {
-                    spinner.classList.add('hidden');
-                    alert('Search failed: ' + error.message);
-                }
-            }
-            
-            async function nextPhrase() {
-                const spinner = document.getElementById('audioSpinner');
-                spinner.classList.remove('hidden');
-                
-                try {
-                    const response = await fetch('/next', {
-                        method: 'POST'
-                    });
-                    
-                    if (response.ok) {
-                        const blob = await response.blob();
-                        const url = URL.createObjectURL(blob);
-                        
-                        const phraseResponse = await fetch('/get_current_phrase');
-                        const phraseData = await phraseResponse.json();
-                        
-                        if (phraseData.phrase) {
-                            updateText(phraseData.phrase);
-                            if (!isSilentMode) {
-                                playAudio(url);
-                            }
-                            updatePreloadStatus();
-                        }
-                    } else {
-                        const errorData = await response.json();
-                        spinner.classList.add('hidden');
-                        
-                        if (errorData.error === 'End of document') {
-                            updateText('You have reached the end of the document.');
-                        } else {
-                            alert('Error: ' + errorData.error);
-                        }
-                    }
-                } catch (error) {
-                    spinner.classList.add('hidden');
-                    alert('Error: ' + error.message);
-                }
-            }
-            
-            async function prevPhrase() {
-                const spinner = document.getElementById('audioSpinner');
-                spinner.classList.remove('hidden');
-                
-                try {
-                    const response = await fetch('/prev', {
-                        method: 'POST'
-                    });
-                    
-                    if (response.ok) {
-                        const blob = await response.blob();
-                        const url = URL.createObjectURL(blob);
-                        
-                        const phraseResponse = await fetch('/get_current_phrase');
-                        const phraseData = await phraseResponse.json();
-                        
-                        if (phraseData.phrase) {
-                            updateText(phraseData.phrase);
-                            if (!isSilentMode) {
-                                playAudio(url);
-                            }
-                            updatePreloadStatus();
-                        }
-                    } else {
-                        const errorData = await response.json();
-                        spinner.classList.add('hidden');
-                        
-                        if (errorData.error === 'Beginning of document') {
-                            updateText('You are at the beginning of the document.');
-                        } else {
-                            alert('Error: ' + errorData.error);
-                        }
-                    }
-                } catch (error) {
-                    spinner.classList.add('hidden');
-                    alert('Error: ' + error.message);
-                }
-            }
-            
-            async function replayPhrase() {
-                const spinner = document.getElementById('audioSpinner');
-                spinner.classList.remove('hidden');
-                
-                try {
-                    const response = await fetch('/get_current_audio');
-                    if (response.ok) {
-                        const blob = await response.blob();
-                        const url = URL.createObjectURL(blob);
-                        
-                        if (!isSilentMode) {
-                            playAudio(url);
-                        }
-                        
-                        const phraseResponse = await fetch('/get_current_phrase');
-                        const phraseData = await phraseResponse.json();
-                        
-                        if (phraseData.phrase) {
-                            updateText(phraseData.phrase);
-                            updatePreloadStatus();
-                        }
-                    } else {
-                        spinner.classList.add('hidden');
-                        alert('Error replaying phrase');
-                    }
-                } catch (error) {
-                    spinner.classList.add('hidden');
-                    alert('Error: ' + error.message);
-                }
-            }
+    Synthesis is single-flight per digest: a request and a preloader worker
+    (or two readers) asking for the same clip wait on one TTS call, and so do
+    other server processes sharing the audio store (see SynthesisCoordinator).
+    """
+    digest = audio_digest(phrase)
+    audio_data = audio_store.get(digest)
+    if audio_data is not None:
+        return audio_data
 
-            async function startFromBeginning() {
-                const spinner = document.getElementById('audioSpinner');
-                spinner.classList.remove('hidden');
-                
-                try {
-                    const response = await fetch('/start_from_beginning', {
-                        method: 'POST'
-                    });
-                    
-                    if (response.ok) {
-                        const blob = await response.blob();
-                        const url = URL.createObjectURL(blob);
-                        
-                        const phraseResponse = await fetch('/get_current_phrase');
-                        const phraseData = await phraseResponse.json();
-                        
-                        if (phraseData.phrase) {
-                            updateText(phraseData.phrase);
-                            if (!isSilentMode) {
-                                playAudio(url);
-                            }
-                            updatePreloadStatus();
-                        }
-                    } else {
-                        const errorData = await response.json();
-                        spinner.classList.add('hidden');
-                        alert('Error: ' + errorData.error);
-                    }
-                } catch (error) {
-                    spinner.classList.add('hidden');
-                    alert('Error: ' + error.message);
-                }
-            }
+    def synthesize():
+        try:
+            # The flight we were waiting to start may have just stored it
+            audio_data, claimed = claim_synthesis(digest)
+            while audio_data is None and not claimed:
+                # Another process is making it; wait for its file rather than call the backend too
+                audio_data = wait_for_other_process(digest)
+                if audio_data is None:
+                    audio_data, claimed = claim_synthesis(digest)
+            if audio_data is None:
+                # Respect the backend's concurrency limit, shared with the request path
+                with backend_slots[TTS_BACKEND]:
+                    started = time.monotonic()
+                    audio_data = generate_audio(phrase)
+                    preload_window.observe_synthesis(time.monotonic() - started)
+                store_synthesis(digest, audio_data)
+        except Exception as e:
+            fail_synthesis(digest, str(e))
+            raise
+        audio_readiness.ready(digest)
+        return audio_data
 
-            function setBackground(type, file) {
-                const body = document.body;
-                const video = document.getElementById('background-video');
-                
-                // Remove selected class from all items
-                document.querySelectorAll('.media-item').forEach(item => item.classList.remove('selected'));
-                
-                // Add selected class to the clicked item
-                const selectedItem = document.querySelector(`.media-item[data-file="${file}"]`);
-                if (selectedItem) {
-                    selectedItem.classList.add('selected');
-                }
-                
-                currentMedia = { type, file };
-                
-                if (type === 'image') {
-                    body.style.backgroundImage = `url('/static/${file}')`;
-                    video.style.display = 'none';
-                    video.pause();
-                } else {
-                    video.src = `/static/${file}`;
-                    video.style.display = 'block';
-                    video.style.opacity = 1;
-                    video.play();
-                    body.style.backgroundImage = 'none';
-                }
-            }
-            
-            // Set up event listeners
-            document.addEventListener('DOMContentLoaded', () => {
-                // Toggle controls panel
-                document.getElementById('controlsToggle').addEventListener('click', toggleControls);
-                document.getElementById('overlay').addEventListener('click', toggleControls);
-                
-                // Silent mode toggle
-                document.getElementById('silentModeToggle').addEventListener('change', (e) => {
-                    isSilentMode = e.target.checked;
-                    if (isSilentMode && currentAudio) {
-                        currentAudio.pause();
-                        isPlaying = false;
-                        document.getElementById('playPauseBtn').innerHTML = '<i class="fas fa-play"></i>';
-                    }
-                });
-                
-                // Start from beginning button
-                document.getElementById('startFromBeginning').addEventListener('click', startFromBeginning);
-                
-                // File input change event
-                document.getElementById('fileInput').addEventListener('change', () => {
-                    const fileInput = document.getElementById('fileInput');
-                    const uploadBtn = document.getElementById('uploadBtn');
-                    
-                    if (fileInput.files && fileInput.files[0]) {
-                        uploadBtn.disabled = false;
-                    } else {
-                        uploadBtn.disabled = true;
-                    }
-                });
-                
-                // Keyboard navigation
-                document.addEventListener('keydown', (e) => {
-                    // Only respond to keyboard shortcuts if a document is loaded
-                    if (document.getElementById('navigationControls').classList.contains('hidden')) {
-                        return;
-                    }
-                    
-                    switch (e.key) {
-                        case 'ArrowLeft':
-                            prevPhrase();
-                            break;
-                        case 'ArrowRight':
-                            nextPhrase();
-                            break;
-                        case 'ArrowUp':
-                            replayPhrase();
-                            break;
-                        case ' ': // Space bar
-                            e.preventDefault(); // Prevent scrolling
-                            togglePlayPause();
-                            break;
-                    }
-                });
-                
-                // Check preload status periodically
-                setInterval(updatePreloadStatus, 5000);
-                
-                // Fetch media files and populate grid
-                fetch('/get_media_files')
-                    .then(response => response.json())
-                    .then(data => {
-                        const mediaGrid = document.getElementById('mediaGrid');
-                        data.forEach(item => {
-                            const gridItem = document.createElement('div');
-                            gridItem.className = 'media-item';
-                            gridItem.dataset.type = item.type;
-                            gridItem.dataset.file = item.file;
-                            
-                            if (item.type === 'image') {
-                                const img = document.createElement('img');
-                                img.src = `/static/${item.file}`;
-                                gridItem.appendChild(img);
-                            } else {
-                                const video = document.createElement('video');
-                                video.src = `/static/${item.file}`;
-                                video.preload = 'metadata';
-                                video.muted = true;
-                                gridItem.appendChild(video);
-                                
-                                const icon = document.createElement('div');
-                                icon.className = 'video-icon';
-                                icon.innerHTML = '<i class="fas fa-play"></i>';
-                                gridItem.appendChild(icon);
-                            }
-                            
-                            mediaGrid.appendChild(gridItem);
-                            
-                            gridItem.addEventListener('click', () => {
-                                setBackground(item.type, item.file);
-                            });
-                        });
-                        
-                        // Set initial selected item
-                        const defaultItem = Array.from(mediaGrid.children).find(item => item.dataset.file === currentMedia.file);
-                        if (defaultItem) {
-                            defaultItem.classList.add('selected');
-                        }
-                    });
-
-                // Background video event listeners
-                const backgroundVideo = document.getElementById('background-video');
-                let isFading = false;
-
-                backgroundVideo.addEventListener('timeupdate', function() {
-                    if (!isFading && backgroundVideo.duration && backgroundVideo.currentTime >= backgroundVideo.duration - 0.1) {
-                        isFading = true;
-                        backgroundVideo.style.transition = 'opacity 0.1s ease';
-                        backgroundVideo.style.opacity = 0.7; // Higher opacity to reduce black flash
-                        backgroundVideo.currentTime = 0;
-                    }
-                });
-
-                backgroundVideo.addEventListener('seeked', function() {
-                    if (isFading) {
-                        backgroundVideo.style.transition = 'opacity 0.1s ease';
-                        backgroundVideo.style.opacity = 1; // Reset to full opacity
-                        isFading = false;
-                    }
-                });
-
-                // Fallback in case something goes wrong with timeupdate
-                backgroundVideo.addEventListener('ended', function() {
-                    backgroundVideo.currentTime = 0;
-                    backgroundVideo.style.transition = 'none';
-                    backgroundVideo.style.opacity = 1;
-                    isFading = false;
-                    backgroundVideo.play();
-                });
-            });
-        </script>
-    </body>
-    </html>
-    '''
+    return synthesis_flights.run(digest, synthesize)
 
-@app.route('/upload', methods=['POST'])
-def upload_file():
-    """Handle file upload and text extraction."""
+def get_async_backend_slots(name):
+    """Return the event-loop counterpart of backend_slots[name], creating it on first use."""
+    if name not in async_backend_slots:
+        async_backend_slots[name] = asyncio.Semaphore(TTS_BACKEND_CONCURRENCY[name])
+    return async_backend_slots[name]
+
+async def load_or_generate_audio_async(phrase):
+    """load_or_generate_audio for event-loop callers, sharing its single-flight registry and steps.
+
+    Only the waits and the TTS call run on the event loop; the store and
+    claim steps run on threads.
+    """
+    digest = audio_digest(phrase)
+    audio_data = await asyncio.to_thread(audio_store.get, digest)
+    if audio_data is not None:
+        return audio_data
+
+    async def synthesize():
+        try:
+            audio_data, claimed = await asyncio.to_thread(claim_synthesis, digest)
+            while audio_data is None and not claimed:
+                audio_data = await wait_for_other_process_async(digest)
+                if audio_data is None:
+                    audio_data, claimed = await asyncio.to_thread(claim_synthesis, digest)
+            if audio_data is None:
+                async with get_async_backend_slots(TTS_BACKEND):
+                    started = time.monotonic()
+                    audio_data = await generate_audio_async(phrase)
+                    preload_window.observe_synthesis(time.monotonic() - started)
+                await asyncio.to_thread(store_synthesis, digest, audio_data)
+        except Exception as e:
+            await asyncio.to_thread(fail_synthesis, digest, str(e))
+            raise
+        audio_readiness.ready(digest)
+        return audio_data
+
+    return await synthesis_flights.run_async(digest, synthesize)
+
+def audio_preloader_worker():
+    """Worker thread that preloads audio in background; several run side by side."""
+    while not stop_generation_event.is_set():
+        # Get the most urgent job from the scheduler
+        job = preload_scheduler.get(timeout=1)
+        if job is None:
+            continue
+        key, phrase = job
+
+        try:
+            # Skip if another path cached it in the meantime
+            if key in audio_cache:
+                continue
+
+            # Back off only while the backend is failing
+            synthesis_backoff.wait(stop_generation_event)
+
+            # Load or generate the audio and cache it
+            audio_cache.put(key, load_or_generate_audio(phrase))
+            synthesis_backoff.success()
+        except Exception as e:
+            # Log any errors
+            synthesis_backoff.failure()
+            event_bus.publish(key[0], {'type': 'failed', 'index': key[2]})
+            print(f"Error in preloader worker: {str(e)}")
+        finally:
+            # Mark the job as done
+            preload_scheduler.done(key)
+
+async def async_preloader_worker(wakeup):
+    """Event-loop counterpart of audio_preloader_worker; many run as tasks on one thread."""
+    while not stop_generation_event.is_set():
+        job = preload_scheduler.get(timeout=0)
+        if job is None:
+            # Jobs queued after clear() set the event again, so none are missed
+            wakeup.clear()
+            job = preload_scheduler.get(timeout=0)
+        if job is None:
+            try:
+                await asyncio.wait_for(wakeup.wait(), 1)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        key, phrase = job
+
+        try:
+            if key in audio_cache:
+                continue
+            if synthesis_backoff.delay:
+                await asyncio.sleep(synthesis_backoff.delay)
+            audio_cache.put(key, await load_or_generate_audio_async(phrase))
+            synthesis_backoff.success()
+        except Exception as e:
+            synthesis_backoff.failure()
+            event_bus.publish(key[0], {'type': 'failed', 'index': key[2]})
+            print(f"Error in async preloader worker: {str(e)}")
+        finally:
+            preload_scheduler.done(key)
+
+def start_async_preloader():
+    """Run the preloader as tasks on the running event loop instead of threads.
     
-    stop_generation_event.set()
-    if 'preloader_thread' in app.config and app.config['preloader_thread'].is_alive():
-        app.config['preloader_thread'].join(timeout=1)
+    One task per backend slot; the slots, not the task count, bound TTS
+    concurrency. Called once at ASGI startup; start_preloader() does nothing
+    afterwards.
+    """
+    loop = asyncio.get_running_loop()
+    wakeup = asyncio.Event()
+    preload_scheduler.listeners.append(lambda: loop.call_soon_threadsafe(wakeup.set))
+    app.config['preloader_mode'] = 'asyncio'
+    workers = TTS_BACKEND_CONCURRENCY.get(TTS_BACKEND, TTS_WORKERS)
+    return [loop.create_task(async_preloader_worker(wakeup)) for _ in range(workers)]
+
+def start_preloader():
+    """Start the shared pool of preloader threads if it is not already running."""
+    if app.config.get('preloader_mode') == 'asyncio':
+        return []
+    with preloader_lock:
+        preloader_threads = [t for t in app.config.get('preloader_threads', []) if t.is_alive()]
+        while len(preloader_threads) < TTS_WORKERS:
+            preloader_thread = threading.Thread(target=audio_preloader_worker, daemon=True)
+            preloader_thread.start()
+            preloader_threads.append(preloader_thread)
+        app.config['preloader_threads'] = preloader_threads
+        return preloader_threads
+
+def manage_audio_cache(reader_id, doc_id, current_index, phrases):
+    """Manage the audio cache after a move, coalescing bursts of moves.
     
-    while not audio_generation_queue.empty():
+    Right away only the landing phrase (in front of every other job) and the
+    few after it are queued, which also cancels queued work for phrases the
+    reader skipped over. The full window is planned once the cursor has been
+    still for NAVIGATION_SETTLE_SECONDS.
+    """
+    preload_window.observe_move(reader_id, doc_id, current_index)
+    event_bus.publish(doc_id, {'type': 'cursor', 'index': current_index, 'total': len(phrases)}, reader_id)
+
+    jobs = []
+    for i in range(current_index, min(current_index + URGENT_LOOKAHEAD, len(phrases) - 1) + 1):
+        key = audio_key(doc_id, i)
+        if key not in audio_cache:
+            priority = FOREGROUND_PRIORITY if i == current_index else (0, i - current_index)
+            phrase = speech_text(phrases, i)
+            audio_readiness.retry(audio_digest(phrase))
+            jobs.append((priority, key, phrase))
+    preload_scheduler.plan(reader_id, jobs)
+
+    navigation_settle.call(
+        reader_id, NAVIGATION_SETTLE_SECONDS, plan_preload_window,
+        reader_id, doc_id, current_index, phrases, session.get('preload_window')
+    )
+
+def plan_preload_window(reader_id, doc_id, current_index, phrases, overrides=None):
+    """Keep past items and schedule future ones around a settled cursor."""
+
+    # Size the window for this reader's pace and the session's overrides
+    pressure = audio_cache.total_bytes / audio_cache.max_bytes
+    retained_past, preloaded_future = preload_window.size(reader_id, pressure, overrides)
+
+    past_start = max(0, current_index - retained_past)
+    past_end = current_index
+    future_start = current_index + 1
+    future_end = min(current_index + preloaded_future, len(phrases) - 1)
+
+    # Pin this reader's window; anything outside it becomes evictable
+    audio_cache.set_working_set(reader_id, [audio_key(doc_id, i) for i in range(past_start, future_end + 1)])
+
+    # Schedule future phrases nearest first; this also cancels jobs from an old position
+    jobs = []
+    current_key = audio_key(doc_id, current_index)
+    if current_key not in audio_cache:
+        jobs.append((FOREGROUND_PRIORITY, current_key, speech_text(phrases, current_index)))
+    for i in range(future_start, future_end + 1):
+        key = audio_key(doc_id, i)
+        if key not in audio_cache:  
+            distance = i - current_index
+            priority = (0 if distance <= URGENT_LOOKAHEAD else 1, distance)
+            phrase = speech_text(phrases, i)
+            jobs.append((priority, key, phrase))
+    preload_scheduler.plan(reader_id, jobs)
+
+def get_audio_for_phrase(doc_id, index, phrases):
+    """Helper function to get audio for a specific phrase."""
+
+    key = audio_key(doc_id, index)
+    # Cached audio is immutable bytes, so hits are shared rather than copied
+    audio_data = audio_cache.get(key)
+    if audio_data is None:
+        # Load from disk or generate audio if not cached
+        phrase = speech_text(phrases, index)
+        try:
+            audio_data = load_or_generate_audio(phrase)
+        except Exception as e:
+            raise phrase_audio_failed(doc_id, index, e)
+        # Cache the audio for future use
+        audio_cache.put(key, audio_data)
+
+    return audio_data
+
+async def get_audio_for_phrase_async(doc_id, index, phrases):
+    """get_audio_for_phrase for event-loop callers."""
+    key = audio_key(doc_id, index)
+    audio_data = audio_cache.get(key)
+    if audio_data is None:
         try:
-            audio_generation_queue.get_nowait()
-            audio_generation_queue.task_done()
-        except queue.Empty:
+            audio_data = await load_or_generate_audio_async(speech_text(phrases, index))
+        except Exception as e:
+            raise phrase_audio_failed(doc_id, index, e)
+        audio_cache.put(key, audio_data)
+
+    return audio_data
+
+def phrase_audio_failed(doc_id, index, error):
+    """Tell the document's /events subscribers a phrase failed; return the exception to raise."""
+    event_bus.publish(doc_id, {'type': 'failed', 'index': index})
+    return Exception(f"Failed to generate audio: {str(error)}")
+
+def get_cached_audio(doc_id, index, phrases):
+    """Return audio for a phrase from memory or disk, or None; never synthesizes."""
+    key = audio_key(doc_id, index)
+    audio_data = audio_cache.get(key)
+    if audio_data is None:
+        phrase = speech_text(phrases, index)
+        audio_data = audio_store.get(audio_digest(phrase))
+        if audio_data is not None:
+            audio_cache.put(key, audio_data)
+    return audio_data
+
+def audio_job(digest):
+    """Describe a pending synthesis: where to wait for it and where the audio will be."""
+    return {
+        'job': digest,
+        'wait_url': url_for('audio_wait', digest=digest),
+        'audio_url': url_for('audio_by_digest', digest=digest),
+        # Another process may make the clip, which this reader's event stream won't report
+        'multi_process': SERVER_PROCESSES > 1
+    }
+
+def audio_or_job(document, index):
+    """Answer with the phrase's audio if it is ready, else queue it and return a 202 with a job handle.
+
+    The request thread never waits on the TTS backend.
+    """
+    audio_data = get_cached_audio(document.doc_id, index, document.phrases)
+    phrase = speech_text(document.phrases, index)
+    digest = audio_digest(phrase)
+    if audio_data is not None:
+        # These URLs name a cursor position, not a clip; only /audio/<digest> may be cached
+        response = audio_response(audio_data)
+        response.cache_control.no_store = True
+        return response
+
+    audio_readiness.retry(digest)
+    preload_scheduler.submit(get_reader_id(), FOREGROUND_PRIORITY, audio_key(document.doc_id, index), phrase)
+    start_preloader()
+    response = jsonify({'status': 'pending', **audio_job(digest)})
+    response.status_code = 202
+    response.headers['Retry-After'] = '1'
+    return response
+
+def phrase_payload(document, index, inline_audio=False):
+    """Build the JSON for a phrase: rendered text, position metadata and an audio reference."""
+    payload = {
+        'index': index,
+        'total_phrases': len(document.phrases),
+        'loading': not document.complete,
+        'title': document.title,
+        'chapter': current_chapter(document, index),
+        'phrase': document.rendered[index]
+    }
+    phrase = speech_text(document.phrases, index)
+    digest = audio_digest(phrase)
+    if digest in audio_store:
+        payload['audio_url'] = url_for('audio_by_digest', digest=digest)
+    else:
+        # Not synthesized yet; navigation already queued it in front of everything else
+        payload['audio_url'] = url_for('phrase_audio', doc_id=document.doc_id, index=index)
+        payload['audio_job'] = audio_job(digest)
+    if inline_audio:
+        audio_data = get_cached_audio(document.doc_id, index, document.phrases)
+        if audio_data is not None:
+            encoded = base64.b64encode(audio_data).decode('ascii')
+            payload['audio'] = f'data:{audio_mimetype(audio_data)};base64,{encoded}'
+    return payload
+
+def audio_response(audio_data):
+    """Wrap audio bytes in a response body directly, without a file wrapper or copy."""
+    return app.response_class(audio_data, mimetype=audio_mimetype(audio_data))
+
+def ui_response(asset):
+    """Serve the best precompressed variant of a UI asset the client accepts, or a 304."""
+    encoding = 'identity'
+    for candidate in ('br', 'gzip'):
+        if candidate in asset['variants'] and request.accept_encodings[candidate]:
+            encoding = candidate
             break
-    audio_cache.clear()
+
+    response = app.response_class(asset['variants'][encoding], mimetype=asset['mimetype'])
+    if encoding != 'identity':
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(f"{asset['version']}-{encoding}")
+    return response.make_conditional(request)
+
+@app.route('/')
+def index():
+    """Serve the reader page; it is revalidated on every load and usually answered with a 304."""
+    response = ui_response(ui_bundle.get('index.html'))
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/ui/<version>/<path:name>')
+def ui_asset(version, name):
+    """Serve a UI asset; URLs carrying the current content hash are cached for good."""
+    asset = ui_bundle.get(name)
+    if asset is None or name == 'index.html':
+        abort(404)
+    response = ui_response(asset)
+    if version == asset['version']:
+        response.cache_control.public = True
+        response.cache_control.max_age = UI_ASSET_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        # A page from before the asset changed; serve the current one uncached
+        response.cache_control.no_cache = True
+    return response
+
+@app.route('/upload', methods=['POST'])
+def upload_file():
+    """Handle file upload and text extraction."""
     
-    stop_generation_event.clear()
+    # Release the previous document's audio and jobs without touching other readers
+    navigation_settle.cancel(get_reader_id())
+    audio_cache.drop_working_set(get_reader_id())
+    preload_scheduler.cancel_reader(get_reader_id())
     
     if 'file' not in request.files:
         return jsonify({'error': 'No file uploaded'}), 400
@@ -1566,31 +2208,29 @@ def upload_file():
     try:
         # Check for valid file types
         if file and (file.filename.endswith('.pdf') or file.filename.endswith('.epub') or file.filename.endswith('.txt')):
-            # Create a temporary file to store the uploaded content
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1])
-            temp_file.write(file.read())
-            temp_file.close()
-            
-            file.seek(0)  # Reset file pointer after reading
-            
-            # Extract text based on file type
-            if file.filename.endswith('.pdf'):
-                text = extract_text_from_pdf(file)
-            elif file.filename.endswith('.epub'):
-                text = extract_text_from_epub(file)
-            elif file.filename.endswith('.txt'):
-                text = extract_text_from_txt(file)
-                
-            phrases = split_into_phrases(text)
-            session['phrases'] = phrases
+            # Stream the upload to disk, hashing it on the way; PDF workers read pages from the file
+            source_path, doc_id = save_upload(file)
+            
+            # A book seen before is served from the document store without extracting it again
+            document = document_store.get(doc_id)
+            if document is not None and not document.failed:
+                os.unlink(source_path)
+            else:
+                document = start_ingestion(doc_id, file.filename, source_path)
+            
+            # Ingestion finishes up front when no phrase turns up, so this is the whole book
+            if not document.phrases:
+                return jsonify({'error': 'No readable text found in the file.'}), 400
+            
+            # The session only holds the document id and the cursor
+            session.pop('phrases', None)
+            session['doc_id'] = document.doc_id
             session['title'] = file.filename
             session['current_index'] = 0
             
-            # Start preloading audio
-            preloader_thread = threading.Thread(target=audio_preloader_worker, daemon=True)
-            preloader_thread.start()
-            app.config['preloader_thread'] = preloader_thread
-            
+            # Make sure the shared preloader is running
+            start_preloader()
+
             return jsonify({
                 'title': file.filename,
                 'has_progress': False
@@ -1603,54 +2243,198 @@ def upload_file():
 
 @app.route('/search', methods=['POST'])
 def search():
-    """Search for a string in the document and set the starting position."""
+    """Search for a string in the document and set the starting position.
+    
+    Moves to the first match by default. direction 'next' or 'prev' steps to the
+    nearest match after or before the current position, wrapping around, and an
+    explicit index jumps to that match.
+    """
     data = request.get_json()
     search_string = data.get('search_string', '')
     if not search_string:
         return jsonify({'error': 'No search string provided'}), 400
     
-    phrases = session.get('phrases', [])
-    if not phrases:
+    document = get_session_document()
+    if document is None or not document.phrases:
         return jsonify({'error': 'No document loaded'}), 400
+    phrases = document.phrases
         
-    matching_indices = [i for i, phrase in enumerate(phrases) if search_string.lower() in phrase.lower()]
+    matching_indices = document.search_index.search(search_string, phrases)
     if len(matching_indices) == 0:
         return jsonify({'error': 'String not found'})
+    
+    current_index = session.get('current_index', 0)
+    direction = data.get('direction', 'first')
+    if data.get('index') in matching_indices:
+        target = data['index']
+    elif direction == 'next':
+        target = matching_indices[bisect.bisect_right(matching_indices, current_index) % len(matching_indices)]
+    elif direction == 'prev':
+        target = matching_indices[bisect.bisect_left(matching_indices, current_index) - 1]
     else:
-        # Set the current index to the first match
-        session['current_index'] = matching_indices[0]
-        
-        # Manage the audio cache for the new position
-        manage_audio_cache(matching_indices[0], phrases)
-        return jsonify({'success': True})
+        target = matching_indices[0]
+    
+    # Set the current index to the chosen match
+    session['current_index'] = target
+    
+    # Manage the audio cache for the new position
+    manage_audio_cache(get_reader_id(), document.doc_id, target, phrases)
+    
+    # Include the matched phrase itself so the client needs no second request
+    response = phrase_payload(document, target, data.get('inline_audio', False))
+    response.update({
+        'success': True,
+        'position': bisect.bisect_left(matching_indices, target) + 1,
+        'total': len(matching_indices),
+        'matches': [
+            {'index': i, 'snippet': make_snippet(phrases[i], search_string)}
+            for i in matching_indices[:SEARCH_RESULT_LIMIT]
+        ]
+    })
+    return jsonify(response)
+
+@app.route('/chapters', methods=['GET'])
+def chapters():
+    """Return the chapters indexed so far for the current document."""
+    document = get_session_document()
+    if document is None:
+        return jsonify({'error': 'No document loaded'}), 400
+    
+    return jsonify({
+        'chapters': [{'index': start, 'title': title} for start, title in document.chapters],
+        'loading': not document.complete
+    })
+
+@app.route('/navigate', methods=['POST'])
+def navigate():
+    """Move the reading position and return the phrase, its metadata and its audio in one response.
+    
+    action is one of 'next', 'prev', 'current', 'start', 'goto' (with an index)
+    or 'step' (with a signed delta, for a burst of next/prev presses sent as one).
+    With inline_audio set, audio that is already synthesized is embedded as a
+    data URI; otherwise the client loads audio_url.
+    """
+    document = get_session_document()
+    if document is None or 'current_index' not in session:
+        return jsonify({'error': 'No document loaded or index not set'}), 400
+    
+    data = request.get_json(silent=True) or {}
+    action = data.get('action', 'current')
+    current_index = session['current_index']
+    
+    if action == 'next':
+        if current_index >= len(document.phrases) - 1:
+            if not document.complete:
+                return jsonify({'error': 'The rest of the document is still loading, try again in a moment'}), 400
+            return jsonify({'error': 'End of document'}), 400
+        new_index = current_index + 1
+    elif action == 'prev':
+        if current_index <= 0:
+            return jsonify({'error': 'Beginning of document'}), 400
+        new_index = current_index - 1
+    elif action == 'step':
+        delta = data.get('delta')
+        if type(delta) is not int:
+            return jsonify({'error': 'Invalid step'}), 400
+        new_index = min(max(current_index + delta, 0), len(document.phrases) - 1)
+        if new_index == current_index and delta > 0:
+            if not document.complete:
+                return jsonify({'error': 'The rest of the document is still loading, try again in a moment'}), 400
+            return jsonify({'error': 'End of document'}), 400
+        if new_index == current_index and delta < 0:
+            return jsonify({'error': 'Beginning of document'}), 400
+    elif action == 'start':
+        new_index = 0
+    elif action == 'goto':
+        new_index = data.get('index')
+        if type(new_index) is not int or not 0 <= new_index < len(document.phrases):
+            return jsonify({'error': 'Invalid phrase index'}), 400
+    elif action == 'current':
+        new_index = current_index
+    else:
+        return jsonify({'error': f'Unknown action: {action}'}), 400
+    
+    # Only touch the session when the cursor actually moves
+    if new_index != current_index:
+        session['current_index'] = new_index
+    
+    # Manage the audio cache
+    manage_audio_cache(get_reader_id(), document.doc_id, new_index, document.phrases)
+    
+    return jsonify(phrase_payload(document, new_index, data.get('inline_audio', False)))
+
+@app.route('/phrase_audio/<doc_id>/<int:index>', methods=['GET'])
+def phrase_audio(doc_id, index):
+    """Redirect to a phrase's content-addressed audio, or queue it and return a job handle (202)."""
+    document = document_store.get(doc_id)
+    if document is None or not 0 <= index < len(document.phrases):
+        return jsonify({'error': 'Phrase not found'}), 404
+    
+    # Don't tie up a thread synthesizing a phrase this reader has already skipped past
+    skipped = session.get('doc_id') == doc_id and session.get('current_index', index) != index
+    if skipped and get_cached_audio(doc_id, index, document.phrases) is None:
+        return jsonify({'error': 'Phrase was skipped'}), 409
+    
+    response = audio_or_job(document, index)
+    if response.status_code == 202:
+        return response
+    phrase = speech_text(document.phrases, index)
+    return redirect(url_for('audio_by_digest', digest=audio_digest(phrase)))
+
+@app.route('/audio/<digest>', methods=['GET'])
+def audio_by_digest(digest):
+    """Serve a synthesized clip by content digest, with a strong ETag and Range support."""
+    if not AUDIO_DIGEST_PATTERN.fullmatch(digest):
+        abort(404)
+    stored = audio_store.locate(digest)
+    if stored is None:
+        abort(404)
+    path, mimetype = stored
+    response = send_file(path, mimetype=mimetype, etag=digest, conditional=True, max_age=AUDIO_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/audio_wait/<digest>', methods=['GET'])
+def audio_wait(digest):
+    """Long-poll for a queued clip; answers as soon as it is ready or failed, or 202 after the timeout."""
+    if not AUDIO_DIGEST_PATTERN.fullmatch(digest):
+        abort(404)
+    timeout = min(max(request.args.get('timeout', AUDIO_WAIT_SECONDS, type=float), 0), AUDIO_WAIT_SECONDS)
+    payload, status_code = audio_wait_result(digest, *audio_readiness.wait(digest, timeout))
+    return jsonify(payload), status_code
+
+def audio_wait_result(digest, status, error):
+    """Build the /audio_wait JSON and status code for a readiness outcome."""
+    if status == 'ready':
+        return {'status': status, 'audio_url': url_for('audio_by_digest', digest=digest)}, 200
+    if status == 'failed':
+        return {'status': status, 'error': error}, 500
+    return {'status': status, **audio_job(digest)}, 202
 
 @app.route('/start_from_beginning', methods=['POST'])
 def start_from_beginning():
-    """Reset to the beginning of the document."""
-    if 'phrases' not in session:
+    """Reset to the beginning of the document and return its audio, or a job handle if not yet synthesized."""
+    document = get_session_document()
+    if document is None:
         return jsonify({'error': 'No document loaded'}), 400
     
     # Reset to beginning
     session['current_index'] = 0
     
-    try:
-        # Get audio for the first phrase
-        audio_buffer = get_audio_for_phrase(0, session['phrases'])
-        
-        # Manage the audio cache
-        manage_audio_cache(0, session['phrases'])
-        
-        return send_file(audio_buffer, mimetype='audio/mp3')
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    # Manage the audio cache; this queues the phrase in front of everything else
+    manage_audio_cache(get_reader_id(), document.doc_id, 0, document.phrases)
+    
+    # Answer a miss right away with a job handle instead of waiting on TTS
+    return audio_or_job(document, 0)
 
 @app.route('/next', methods=['POST'])
 def next_phrase():
-    """Move to the next phrase and return its audio."""
-    if 'phrases' not in session or 'current_index' not in session:
+    """Move to the next phrase and return its audio, or a job handle if not yet synthesized."""
+    document = get_session_document()
+    if document is None or 'current_index' not in session:
         return jsonify({'error': 'No document loaded or index not set'}), 400
     
-    phrases = session['phrases']
+    phrases = document.phrases
     current_index = session['current_index']
     
     if current_index < len(phrases) - 1:
@@ -1658,26 +2442,24 @@ def next_phrase():
         session['current_index'] += 1
         new_index = session['current_index']
         
-        try:
-            # Get audio for the new phrase
-            audio_buffer = get_audio_for_phrase(new_index, phrases)
-            
-            # Manage the audio cache
-            manage_audio_cache(new_index, phrases)
-            
-            return send_file(audio_buffer, mimetype='audio/mp3')
-        except Exception as e:
-            return jsonify({'error': str(e)}), 500
+        # Manage the audio cache; this queues the phrase in front of everything else
+        manage_audio_cache(get_reader_id(), document.doc_id, new_index, phrases)
+        
+        # Answer a miss right away with a job handle instead of waiting on TTS
+        return audio_or_job(document, new_index)
     
+    if not document.complete:
+        return jsonify({'error': 'The rest of the document is still loading, try again in a moment'}), 400
     return jsonify({'error': 'End of document'}), 400
 
 @app.route('/prev', methods=['POST'])
 def prev_phrase():
-    """Move to the previous phrase and return its audio."""
-    if 'phrases' not in session or 'current_index' not in session:
+    """Move to the previous phrase and return its audio, or a job handle if not yet synthesized."""
+    document = get_session_document()
+    if document is None or 'current_index' not in session:
         return jsonify({'error': 'No document loaded or index not set'}), 400
     
-    phrases = session['phrases']
+    phrases = document.phrases
     current_index = session['current_index']
     
     if current_index > 0:
@@ -1685,82 +2467,260 @@ def prev_phrase():
         session['current_index'] -= 1
         new_index = session['current_index']
         
-        try:
-            # Get audio for the new phrase
-            audio_buffer = get_audio_for_phrase(new_index, phrases)
-            
-            # Manage the audio cache
-            manage_audio_cache(new_index, phrases)
-            
-            return send_file(audio_buffer, mimetype='audio/mp3')
-        except Exception as e:
-            return jsonify({'error': str(e)}), 500
+        # Manage the audio cache; this queues the phrase in front of everything else
+        manage_audio_cache(get_reader_id(), document.doc_id, new_index, phrases)
+        
+        # Answer a miss right away with a job handle instead of waiting on TTS
+        return audio_or_job(document, new_index)
     
     return jsonify({'error': 'Beginning of document'}), 400
 
 @app.route('/get_current_audio', methods=['GET'])
 def get_current_audio():
-    """Return audio for the current phrase (used after initial search or replay)."""
-    if 'phrases' not in session or 'current_index' not in session:
+    """Return audio for the current phrase, or a job handle if not yet synthesized."""
+    document = get_session_document()
+    if document is None or 'current_index' not in session:
         return jsonify({'error': 'No document loaded or index not set'}), 400
     
     current_index = session['current_index']
-    phrases = session['phrases']
+    phrases = document.phrases
     
-    try:
-        # Get audio for the current phrase
-        audio_buffer = get_audio_for_phrase(current_index, phrases)
-        
-        # Manage the audio cache
-        manage_audio_cache(current_index, phrases)
-        
-        return send_file(audio_buffer, mimetype='audio/mp3')
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    # Manage the audio cache; this queues the phrase in front of everything else
+    manage_audio_cache(get_reader_id(), document.doc_id, current_index, phrases)
+    
+    # Answer a miss right away with a job handle instead of waiting on TTS
+    return audio_or_job(document, current_index)
 
 @app.route('/get_current_phrase', methods=['GET'])
 def get_current_phrase():
     """Return the current phrase text for display with clickable words."""
-    if 'phrases' not in session or 'current_index' not in session:
+    document = get_session_document()
+    if document is None or 'current_index' not in session:
         return jsonify({'error': 'No document loaded or index not set'}), 400
     
-    phrase = session['phrases'][session['current_index']]
-    
-    # Clean the phrase and make words clickable
-    cleaned_phrase = clean_file_paths(phrase)
-    clickable_phrase = make_words_clickable(cleaned_phrase)
+    current_index = session['current_index']
     
-    return jsonify({'phrase': clickable_phrase})
+    # Phrases are rendered with clickable words once, when the document is indexed
+    return jsonify({'phrase': document.rendered[current_index]})
 
 @app.route('/preload_status', methods=['GET'])
 def preload_status():
     """Return the status of cached audio files."""
-    if 'phrases' not in session or 'current_index' not in session:
+    document = get_session_document()
+    if document is None or 'current_index' not in session:
         return jsonify({})
     
     current_index = session['current_index']
-    cached_indices = list(audio_cache.keys())
-    total_phrases = len(session['phrases'])
+    cached_indices = audio_cache.cached_indices(document.doc_id, TTS_VOICE)
+    total_phrases = len(document.phrases)
     
     return jsonify({
         'current_index': current_index,
         'cached': cached_indices,
-        'total_phrases': total_phrases
+        'total_phrases': total_phrases,
+        'loading': not document.complete
+    })
+
+@app.route('/preload_window', methods=['GET', 'POST'])
+def preload_window_settings():
+    """Show or override this session's preload window.
+    
+    POST {"future": n, "past": n} pins either size (up to the MAX_* bounds);
+    null hands it back to the adaptive sizing.
+    """
+    overrides = dict(session.get('preload_window', {}))
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        limits = {'future': MAX_PRELOADED_FUTURE, 'past': MAX_RETAINED_PAST}
+        for name, limit in limits.items():
+            if name not in data:
+                continue
+            value = data[name]
+            if value is not None and (type(value) is not int or not 0 <= value <= limit):
+                return jsonify({'error': f'{name} must be between 0 and {limit}, or null'}), 400
+            overrides[name] = value
+        session['preload_window'] = {k: v for k, v in overrides.items() if v is not None}
+        
+        # Re-plan right away with the new window
+        document = get_session_document()
+        if document is not None and 'current_index' in session:
+            manage_audio_cache(get_reader_id(), document.doc_id, session['current_index'], document.phrases)
+    
+    reader_id = get_reader_id()
+    pressure = audio_cache.total_bytes / audio_cache.max_bytes
+    past, future = preload_window.size(reader_id, pressure, session.get('preload_window'))
+    return jsonify({
+        'past': past,
+        'future': future,
+        'overrides': session.get('preload_window', {}),
+        'cache_pressure': round(pressure, 3),
+        **preload_window.stats(reader_id)
+    })
+
+@app.route('/audio_manifest', methods=['GET'])
+def audio_manifest():
+    """List upcoming phrases whose audio is already synthesized, for the client to prefetch.
+    
+    Phrases still waiting on synthesis are left out; the client asks again
+    when the server reports them cached.
+    """
+    document = get_session_document()
+    if document is None or 'current_index' not in session:
+        return jsonify({'error': 'No document loaded or index not set'}), 400
+    
+    current_index = session['current_index']
+    count = min(max(request.args.get('count', AUDIO_PREFETCH_COUNT, type=int), 0), MAX_PRELOADED_FUTURE)
+    upcoming = []
+    for index in range(current_index + 1, min(current_index + 1 + count, len(document.phrases))):
+        phrase = speech_text(document.phrases, index)
+        digest = audio_digest(phrase)
+        if digest in audio_store:
+            upcoming.append({'index': index, 'audio_url': url_for('audio_by_digest', digest=digest)})
+    
+    return jsonify({'doc_id': document.doc_id, 'index': current_index, 'phrases': upcoming})
+
+def audio_stream_range(document, current_index, args):
+    """Validate /stream_audio arguments into (start, end, stream_id); raise ValueError if unusable."""
+    if get_tts_backend().mimetype != 'audio/mpeg':
+        raise ValueError('Continuous reading needs an MP3 TTS backend')
+    phrases = document.phrases
+    start = args.get('start', current_index, type=int)
+    if not 0 <= start < len(phrases):
+        raise ValueError('Invalid phrase index')
+    chapter = current_chapter(document, start)
+    if chapter is not None and chapter + 1 < len(document.chapters):
+        chapter_end = document.chapters[chapter + 1][0] - 1
+    else:
+        chapter_end = len(phrases) - 1
+    end = args.get('end', chapter_end, type=int)
+    end = max(start, min(end, start + STREAM_MAX_PHRASES - 1, len(phrases) - 1))
+    return start, end, args.get('stream', '')
+
+def error_response(message, status_code):
+    """Build a JSON error response; for helpers shared with the ASGI routes, which can't return tuples."""
+    return app.make_response((jsonify({'error': message}), status_code))
+
+def open_audio_stream():
+    """Start a /stream_audio run for the session: (document, start, end, stream_id, reader_id), or an error response."""
+    document = get_session_document()
+    if document is None or 'current_index' not in session:
+        return error_response('No document loaded or index not set', 400)
+    try:
+        start, end, stream_id = audio_stream_range(document, session['current_index'], request.args)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    reader_id = get_reader_id()
+    
+    # Get the preloader working ahead of the stream
+    manage_audio_cache(reader_id, document.doc_id, start, document.phrases)
+    return document, start, end, stream_id, reader_id
+
+def stream_segment(doc_id, index, audio_data, offset, stream_id, reader_id):
+    """Announce a phrase's place in a /stream_audio run; return its frames and the stream offset after it."""
+    frames, duration = parse_mp3_frames(audio_data)
+    event_bus.publish(doc_id, {'type': 'segment', 'stream': stream_id, 'index': index, 'offset': round(offset, 3)}, reader_id)
+    return frames, offset + duration
+
+def end_stream(doc_id, end, offset, stream_id, reader_id):
+    """Tell the reader's event stream a /stream_audio run is over and how long it played."""
+    event_bus.publish(doc_id, {'type': 'stream_end', 'stream': stream_id, 'end': end, 'offset': round(offset, 3)}, reader_id)
+
+@app.route('/stream_audio', methods=['GET'])
+def stream_audio():
+    """Stream the audio of a run of phrases as one continuous MP3 over a single response.
+    
+    start defaults to the current phrase and end (inclusive) to the last phrase
+    of its chapter. Before each phrase's frames go out, a 'segment' event with
+    the phrase index and its time offset in the stream is sent on the reader's
+    /events stream, tagged with the caller's stream id, so the page can follow
+    along. A 'stream_end' event closes the run.
+    """
+    opened = open_audio_stream()
+    if isinstance(opened, Response):
+        return opened
+    document, start, end, stream_id, reader_id = opened
+    doc_id = document.doc_id
+    
+    def generate():
+        offset = 0.0
+        for index in range(start, end + 1):
+            try:
+                audio_data = get_audio_for_phrase(doc_id, index, document.phrases)
+            except Exception as e:
+                # Skip the phrase rather than cut the stream; a 'failed' event was sent
+                print(f"Error streaming phrase {index}: {str(e)}")
+                continue
+            frames, offset = stream_segment(doc_id, index, audio_data, offset, stream_id, reader_id)
+            yield frames
+        end_stream(doc_id, end, offset, stream_id, reader_id)
+    
+    return Response(generate(), mimetype='audio/mpeg', headers={'Cache-Control': 'no-store'})
+
+def event_snapshot(document, cursor):
+    """The first /events message: everything cached for the document, and the reader's position."""
+    return {
+        'type': 'snapshot',
+        'index': cursor,
+        'total': len(document.phrases),
+        'loading': not document.complete,
+        'cached': audio_cache.cached_indices(document.doc_id, TTS_VOICE)
+    }
+
+def format_sse(event):
+    """Encode an event dict as a compact Server-Sent Events message."""
+    data = {k: v for k, v in event.items() if k != 'type'}
+    return f"event: {event['type']}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+def open_event_stream():
+    """Subscribe the session's reader to its document's events: (document, subscription), or an error response."""
+    document = get_session_document()
+    if document is None or 'current_index' not in session:
+        return error_response('No document loaded or index not set', 400)
+    return document, event_bus.subscribe(get_reader_id(), document.doc_id, session['current_index'])
+
+@app.route('/events', methods=['GET'])
+def events():
+    """Stream preload and cursor changes for the current document as Server-Sent Events.
+    
+    The stream opens with a snapshot of the cached phrases, then sends only
+    deltas: cached, evicted, failed, cursor and progress, plus the segment
+    and stream_end markers of /stream_audio.
+    """
+    opened = open_event_stream()
+    if isinstance(opened, Response):
+        return opened
+    document, subscription = opened
+    
+    def stream():
+        try:
+            yield format_sse(event_snapshot(document, subscription.cursor))
+            while not stop_generation_event.is_set():
+                if subscription.resync():
+                    # Too far behind to replay deltas; start over from current state
+                    yield format_sse(event_snapshot(document, subscription.cursor))
+                try:
+                    event = subscription.events.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_sse(event)
+        finally:
+            event_bus.unsubscribe(subscription)
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
     })
 
 @app.route('/unload', methods=['POST'])
 def unload():
     """Clear the session and stop preloading to allow uploading a new file."""
     
-    stop_generation_event.set()
-    
-    while not audio_generation_queue.empty():
-        try:
-            audio_generation_queue.get_nowait()
-            audio_generation_queue.task_done()
-        except queue.Empty:
-            break
-    audio_cache.clear()
+    # Release this reader's audio and cancel its queued jobs
+    navigation_settle.cancel(get_reader_id())
+    audio_cache.drop_working_set(get_reader_id())
+    preload_scheduler.cancel_reader(get_reader_id())
+    preload_window.forget(get_reader_id())
     
     session.clear()
     
@@ -1772,24 +2732,285 @@ def request_entity_too_large(error):
 
 @app.route('/get_media_files', methods=['GET'])
 def get_media_files():
-    """Return a list of image and video files in the static folder."""
-    static_folder = os.path.join(app.root_path, 'static')
-    files = os.listdir(static_folder)
-    media_files = [
-        {'type': 'image', 'file': f} if f.lower().endswith(('.jpg', '.jpeg', '.png', '.gif')) else
-        {'type': 'video', 'file': f} for f in files if f.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.mp4'))
+    """Return a page of image and video files in the static folder, with thumbnail URLs."""
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', MEDIA_PAGE_SIZE, type=int), 1), MEDIA_PAGE_SIZE * 4)
+    items, total = media_index.page(offset, limit)
+    page = [
+        {
+            'type': item['type'],
+            'file': item['file'],
+            'thumbnail': url_for('media_thumbnail', file=item['file'], v=item['version']),
+        }
+        for item in items
     ]
-    return jsonify(media_files)
+    next_offset = offset + limit if offset + limit < total else None
+    return jsonify({'items': page, 'total': total, 'next_offset': next_offset})
+
+@app.route('/media_thumbnail/<path:file>', methods=['GET'])
+def media_thumbnail(file):
+    """Serve a small preview of a background file; the URL changes whenever the file does."""
+    item = media_index.get(file)
+    if item is None:
+        abort(404)
+    path = media_index.thumbnail(item)
+    if path is None:
+        if item['type'] == 'video':
+            # No ffmpeg to make a poster; the client shows a placeholder
+            abort(404)
+        # No Pillow; fall back to the (lazily loaded) original image
+        path = os.path.join(media_index.root, item['file'])
+    return send_file(path, max_age=UI_ASSET_MAX_AGE, conditional=True)
 
-if __name__ == '__main__':
-    # Initialize the audio preloader thread
-    preloader_thread = threading.Thread(target=audio_preloader_worker, daemon=True)
-    preloader_thread.start()
-    app.config['preloader_thread'] = preloader_thread
+class AsyncReader:
+    """ASGI application for SERVE_MODE=asgi.
     
+    The endpoints that hold a request open while audio is synthesized or
+    events trickle in (/audio_wait, /events and /stream_audio) run as
+    coroutines on the event loop, so an idle listener costs no thread. Every
+    other route is quick and runs the Flask app on a thread pool, several at
+    a time. Startup runs the preloader as event-loop tasks.
+    """
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.executor = ThreadPoolExecutor(max_workers=ASGI_WSGI_THREADS, thread_name_prefix='wsgi')
+        self.adapter = flask_app.url_map.bind('localhost')
+        self.handlers = {
+            'audio_wait': self.audio_wait,
+            'events': self.events,
+            'stream_audio': self.stream_audio
+        }
+        self.preloader_tasks = []
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        handler = None
+        if scope['type'] == 'http':
+            try:
+                endpoint, values = self.adapter.match(scope['path'], scope['method'])
+                handler = self.handlers.get(endpoint)
+            except HTTPException:
+                pass
+        if handler is None:
+            return await self.wsgi(scope, receive, send)
+        await handler(scope, receive, send, **values)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.preloader_tasks = start_async_preloader()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                stop_generation_event.set()
+                for task in self.preloader_tasks:
+                    task.cancel()
+                await asyncio.gather(*self.preloader_tasks, return_exceptions=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def wsgi(self, scope, receive, send):
+        """Run the Flask app for a request on the thread pool, streaming its response back."""
+        environ = self.environ(scope)
+        declared_length = environ.get('CONTENT_LENGTH')
+        max_length = self.flask_app.config['MAX_CONTENT_LENGTH']
+        # Spooled to disk past a megabyte; a body Flask will refuse with a 413 isn't read at all
+        body = tempfile.SpooledTemporaryFile(max_size=UPLOAD_CHUNK_SIZE)
+        if not (declared_length and max_length and int(declared_length) > max_length):
+            more_body = True
+            while more_body:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    body.close()
+                    return
+                body.write(message.get('body', b''))
+                more_body = message.get('more_body', False)
+            environ['CONTENT_LENGTH'] = str(body.tell())
+            body.seek(0)
+        environ['wsgi.input'] = body
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, self.run_wsgi, environ, loop, send)
+        finally:
+            body.close()
+
+    def run_wsgi(self, environ, loop, send):
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+        def send_message(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        result = self.flask_app(environ, start_response)
+        try:
+            send_message({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+            for chunk in result:
+                if chunk:
+                    send_message({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            send_message({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+    def environ(self, scope):
+        """Build a WSGI environ (without a body) for an ASGI HTTP scope."""
+        server = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            # WSGI carries paths as latin-1 decoded bytes
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1] or 80),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': BytesIO(),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = f'HTTP_{name}'
+            environ[name] = f'{environ[name]},{value}' if name in environ else value
+        return environ
+
+    async def in_request(self, scope, fn):
+        """Run fn on a worker thread inside a Flask request context (session, url_for) for the scope."""
+        environ = self.environ(scope)
+
+        def call():
+            with self.flask_app.request_context(environ):
+                return fn()
+
+        return await asyncio.to_thread(call)
+
+    async def send_response(self, send, response):
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.headers.items()]
+        })
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+
+    async def start_stream(self, send, headers):
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()]
+        })
+
+    async def send_chunk(self, send, chunk, more_body=True):
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        await send({'type': 'http.response.body', 'body': chunk, 'more_body': more_body})
+
+    async def wait_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def audio_wait(self, scope, receive, send, digest):
+        """/audio_wait, suspended on the readiness registry rather than a thread."""
+        if not AUDIO_DIGEST_PATTERN.fullmatch(digest):
+            return await self.send_response(send, await self.in_request(scope, lambda: error_response('Unknown audio', 404)))
+        args = MultiDict(parse_qsl(scope['query_string'].decode('latin-1')))
+        timeout = min(max(args.get('timeout', AUDIO_WAIT_SECONDS, type=float), 0), AUDIO_WAIT_SECONDS)
+        outcome = await audio_readiness.wait_async(digest, timeout)
+        response = await self.in_request(scope, lambda: self.flask_app.make_response(audio_wait_result(digest, *outcome)))
+        await self.send_response(send, response)
+
+    async def events(self, scope, receive, send):
+        """/events, with each subscription drained by a coroutine rather than a blocked thread."""
+        opened = await self.in_request(scope, open_event_stream)
+        if isinstance(opened, Response):
+            return await self.send_response(send, opened)
+        document, subscription = opened
+        subscription.bind_loop(asyncio.get_running_loop())
+        disconnected = asyncio.ensure_future(self.wait_disconnect(receive))
+        try:
+            await self.start_stream(send, {
+                'content-type': 'text/event-stream; charset=utf-8',
+                'cache-control': 'no-cache',
+                'x-accel-buffering': 'no'
+            })
+            await self.send_chunk(send, format_sse(event_snapshot(document, subscription.cursor)))
+            while not stop_generation_event.is_set() and not disconnected.done():
+                if subscription.resync():
+                    # Too far behind to replay deltas; start over from current state
+                    await self.send_chunk(send, format_sse(event_snapshot(document, subscription.cursor)))
+                # Events published after clear() set the flag again, so none are missed
+                subscription.wakeup.clear()
+                try:
+                    event = subscription.events.get_nowait()
+                except queue.Empty:
+                    woken = asyncio.ensure_future(subscription.wakeup.wait())
+                    done, _ = await asyncio.wait(
+                        {woken, disconnected}, timeout=SSE_KEEPALIVE_SECONDS, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    woken.cancel()
+                    if not done:
+                        await self.send_chunk(send, ': keepalive\n\n')
+                    continue
+                await self.send_chunk(send, format_sse(event))
+            await self.send_chunk(send, b'', more_body=False)
+        finally:
+            disconnected.cancel()
+            event_bus.unsubscribe(subscription)
+
+    async def stream_audio(self, scope, receive, send):
+        """/stream_audio, awaiting each phrase's synthesis on the event loop."""
+        opened = await self.in_request(scope, open_audio_stream)
+        if isinstance(opened, Response):
+            return await self.send_response(send, opened)
+        document, start, end, stream_id, reader_id = opened
+        doc_id = document.doc_id
+        disconnected = asyncio.ensure_future(self.wait_disconnect(receive))
+        try:
+            await self.start_stream(send, {'content-type': 'audio/mpeg', 'cache-control': 'no-store'})
+            offset = 0.0
+            for index in range(start, end + 1):
+                if disconnected.done():
+                    return
+                try:
+                    audio_data = await get_audio_for_phrase_async(doc_id, index, document.phrases)
+                except Exception as e:
+                    # Skip the phrase rather than cut the stream; a 'failed' event was sent
+                    print(f"Error streaming phrase {index}: {str(e)}")
+                    continue
+                frames, offset = stream_segment(doc_id, index, audio_data, offset, stream_id, reader_id)
+                await self.send_chunk(send, frames)
+            end_stream(doc_id, end, offset, stream_id, reader_id)
+            await self.send_chunk(send, b'', more_body=False)
+        finally:
+            disconnected.cancel()
+
+# Serve with SERVE_MODE=asgi python app.py, or any ASGI server: uvicorn app:asgi_app
+asgi_app = AsyncReader(app)
+
+if __name__ == '__main__' and SERVE_MODE == 'asgi':
+    if uvicorn is None:
+        raise SystemExit('SERVE_MODE=asgi needs uvicorn installed')
+    # The ASGI lifespan starts the preloader on the event loop
+    uvicorn.run(asgi_app, host='localhost', port=5000)
+elif __name__ == '__main__':
+    # Initialize the audio preloader threads
+    preloader_threads = start_preloader()
+
     try:
         app.run(debug=True, host='localhost', port=5000)
     finally:
         # Clean up when the application exits
         stop_generation_event.set()
-        preloader_thread.join(timeout=2)
\ No newline at end of file
+        for preloader_thread in preloader_threads:
+            preloader_thread.join(timeout=2)
\ No newline at end of file
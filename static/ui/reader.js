@@ -0,0 +1,927 @@
+let currentAudio = null;
+let preloadedStatus = {};
+let controlsVisible = false;
+let isPlaying = false;
+let currentFilePath = null;
+let currentMedia = { type: 'image', file: 'image.png' }; // Default background
+let isSilentMode = false;
+let lastSearch = null;
+let preloadEvents = null;
+let renderPending = false;
+const PREFETCH_COUNT = 5;  // Upcoming clips kept in memory ahead of the cursor
+const PREFETCH_BUFFER_SIZE = 20;
+const AUDIO_WAIT_GRACE_MS = 2000;  // How long the event stream gets to report a queued clip before long-polling for it
+let prefetchedAudio = new Map();  // audio_url -> blob object URL, least recently used first
+let prefetchRunning = false;
+let prefetchAgain = false;
+let isContinuousMode = false;
+let continuousStream = null;  // { id, segments: [{index, offset}], end, shownIndex }
+let lastPhrase = null;  // Last payload from /navigate or /search
+let pendingSteps = 0;
+let stepping = false;
+let holdingArrow = false;
+let pendingAudio = null;  // { index, job } for a phrase whose audio is still being synthesized
+
+// Markup for an icon from the inline SVG sprite
+function icon(name) {
+    return `<svg class="icon"><use href="#icon-${name}"></use></svg>`;
+}
+
+// Toggle controls panel
+function toggleControls() {
+    const controlsPanel = document.getElementById('controlsPanel');
+    const overlay = document.getElementById('overlay');
+
+    controlsVisible = !controlsVisible;
+
+    if (controlsVisible) {
+        controlsPanel.classList.add('visible');
+        overlay.classList.add('visible');
+    } else {
+        controlsPanel.classList.remove('visible');
+        overlay.classList.remove('visible');
+    }
+}
+
+// Handle text transitions with clickable words
+function updateText(text) {
+    const textContent = document.getElementById('currentPhrase');
+    const textDisplay = document.getElementById('textDisplay');
+
+    // Apply fade out
+    textContent.classList.add('fade');
+
+    // After fade out, update text and fade in
+    setTimeout(() => {
+        textContent.innerHTML = text;
+        textContent.classList.remove('fade');
+    }, 300);
+}
+
+// Update progress bar
+function updateProgressBar(currentIndex, totalPhrases) {
+    const progressBar = document.getElementById('progressBar');
+    const percentage = (currentIndex / (totalPhrases - 1)) * 100;
+    progressBar.style.width = `${percentage}%`;
+}
+
+// Play audio function
+async function playAudio(url) {
+    if (currentAudio) {
+        currentAudio.pause();
+        currentAudio.currentTime = 0;
+    }
+
+    const audio = currentAudio = new Audio(url);
+
+    currentAudio.addEventListener('playing', () => {
+        document.getElementById('audioSpinner').classList.add('hidden');
+        document.getElementById('playPauseBtn').innerHTML = icon('pause');
+        isPlaying = true;
+    });
+
+    currentAudio.addEventListener('ended', () => {
+        document.getElementById('playPauseBtn').innerHTML = icon('play');
+        isPlaying = false;
+    });
+
+    currentAudio.addEventListener('error', () => {
+        if (audio !== currentAudio) {
+            return;  // Superseded by a newer phrase
+        }
+        document.getElementById('audioSpinner').classList.add('hidden');
+        alert('Error playing audio');
+        isPlaying = false;
+    });
+
+    try {
+        await currentAudio.play();
+    } catch (err) {
+        console.error('Audio playback error:', err);
+        document.getElementById('audioSpinner').classList.add('hidden');
+        alert('Error playing audio. Try again or reload the page.');
+        isPlaying = false;
+    }
+}
+
+// Toggle play/pause
+function togglePlayPause() {
+    if (!currentAudio) return;
+
+    if (isPlaying) {
+        currentAudio.pause();
+        document.getElementById('playPauseBtn').innerHTML = icon('play');
+        isPlaying = false;
+    } else {
+        currentAudio.play();
+        document.getElementById('playPauseBtn').innerHTML = icon('pause');
+        isPlaying = true;
+    }
+}
+
+async function uploadFile() {
+    const fileInput = document.getElementById('fileInput');
+    const file = fileInput.files[0];
+
+    if (!file) {
+        alert('Please select a file');
+        return;
+    }
+
+    const uploadButton = document.getElementById('uploadBtn');
+    uploadButton.disabled = true;
+
+    const spinner = document.getElementById('spinner');
+    spinner.classList.remove('hidden');
+
+    const formData = new FormData();
+    formData.append('file', file);
+
+    try {
+        const response = await fetch('/upload', {
+            method: 'POST',
+            body: formData
+        });
+
+        const result = await response.json();
+
+        if (result.title) {
+            document.getElementById('title').textContent = result.title;
+            document.getElementById('documentInfo').classList.remove('hidden');
+            document.getElementById('searchSection').classList.remove('hidden');
+            document.getElementById('navigationControls').classList.remove('hidden');
+
+            // Follow preload progress, then get the current phrase and audio in one request
+            connectPreloadEvents();
+            await navigate('current');
+            loadChapters();
+        } else {
+            alert('Error: ' + result.error);
+        }
+    } catch (error) {
+        alert('Upload failed: ' + error.message);
+    } finally {
+        spinner.classList.add('hidden');
+        uploadButton.disabled = false;
+    }
+}
+
+function unloadFile() {
+    fetch('/unload', { method: 'POST' });
+    document.getElementById('documentInfo').classList.add('hidden');
+    document.getElementById('searchSection').classList.add('hidden');
+    document.getElementById('navigationControls').classList.add('hidden');
+    document.getElementById('audioSpinner').classList.add('hidden');
+    document.getElementById('preloadStatus').classList.add('hidden');
+    document.getElementById('chapterSelect').classList.add('hidden');
+    document.getElementById('searchResults').classList.add('hidden');
+    lastSearch = null;
+    lastPhrase = null;
+    pendingAudio = null;
+    document.getElementById('fileInput').value = '';
+    document.getElementById('progressBar').style.width = '0%';
+    updateText('Upload a document and search for text to begin reading.');
+    disconnectPreloadEvents();
+    clearPrefetchedAudio();
+    preloadedStatus = {};
+    currentFilePath = null;
+    if (currentAudio) {
+        currentAudio.pause();
+        currentAudio = null;
+    }
+    isPlaying = false;
+}
+
+// Apply a preload event from the server and redraw the status at most once per frame
+function applyPreloadEvent(type, data) {
+    if (type === 'snapshot') {
+        preloadedStatus = {
+            index: data.index,
+            total: data.total,
+            loading: data.loading,
+            cached: new Set(data.cached),
+            failed: new Set()
+        };
+    } else if (!preloadedStatus.cached) {
+        return;
+    } else if (type === 'cached') {
+        preloadedStatus.cached.add(data.index);
+        preloadedStatus.failed.delete(data.index);
+        if (data.index > preloadedStatus.index && data.index <= preloadedStatus.index + PREFETCH_COUNT) {
+            prefetchUpcomingAudio();
+        }
+    } else if (type === 'evicted') {
+        preloadedStatus.cached.delete(data.index);
+    } else if (type === 'failed') {
+        preloadedStatus.failed.add(data.index);
+    } else if (type === 'cursor' || type === 'progress') {
+        Object.assign(preloadedStatus, data);
+    }
+
+    resolvePendingAudio();
+
+    if (!renderPending) {
+        renderPending = true;
+        requestAnimationFrame(updatePreloadStatus);
+    }
+}
+
+// Wait for a phrase's queued synthesis, normally through the /events stream
+// reporting it cached. An /audio_wait long-poll starts right away when there is
+// no open stream or the server runs several processes (the clip may be made by
+// one this stream isn't connected to), and otherwise after a short grace period.
+function awaitPhraseAudio(data) {
+    const pending = pendingAudio = { index: data.index, job: data.audio_job };
+    document.getElementById('audioSpinner').classList.remove('hidden');
+    // The server queued it again, so an earlier failure no longer applies
+    if (preloadedStatus.failed) {
+        preloadedStatus.failed.delete(data.index);
+    }
+    resolvePendingAudio();
+    if (pendingAudio !== pending) {
+        return;
+    }
+
+    const streamOpen = preloadEvents && preloadEvents.readyState === EventSource.OPEN;
+    const delay = streamOpen && !pending.job.multi_process ? AUDIO_WAIT_GRACE_MS : 0;
+    setTimeout(() => longPollPhraseAudio(pending), delay);
+}
+
+async function longPollPhraseAudio(pending) {
+    try {
+        while (pendingAudio === pending) {
+            const response = await fetch(pending.job.wait_url);
+            const result = await response.json();
+            if (pendingAudio !== pending) {
+                return;
+            }
+            if (result.status === 'ready') {
+                pendingAudio = null;
+                playAudio(result.audio_url);
+            } else if (result.status === 'failed') {
+                pendingAudio = null;
+                document.getElementById('audioSpinner').classList.add('hidden');
+                alert('Error generating audio: ' + result.error);
+            }
+        }
+    } catch (error) {
+        console.error('Error waiting for audio:', error);
+    }
+}
+
+function resolvePendingAudio() {
+    const pending = pendingAudio;
+    if (!pending || !preloadedStatus.cached) {
+        return;
+    }
+    if (preloadedStatus.cached.has(pending.index)) {
+        pendingAudio = null;
+        playAudio(pending.job.audio_url);
+    } else if (preloadedStatus.failed.has(pending.index)) {
+        pendingAudio = null;
+        document.getElementById('audioSpinner').classList.add('hidden');
+        alert('Error generating audio');
+    }
+}
+
+// Subscribe to server-pushed cache and cursor changes for the loaded document
+function connectPreloadEvents() {
+    if (preloadEvents) {
+        preloadEvents.close();
+    }
+    preloadedStatus = {};
+    preloadEvents = new EventSource('/events');
+    ['snapshot', 'cached', 'evicted', 'failed', 'cursor', 'progress'].forEach(type => {
+        preloadEvents.addEventListener(type, e => applyPreloadEvent(type, JSON.parse(e.data)));
+    });
+    ['segment', 'stream_end'].forEach(type => {
+        preloadEvents.addEventListener(type, e => applyStreamEvent(type, JSON.parse(e.data)));
+    });
+}
+
+// Pull upcoming synthesized clips into memory so the next phrase starts without a round trip
+async function prefetchUpcomingAudio() {
+    if (isSilentMode || isContinuousMode) {
+        return;
+    }
+    if (prefetchRunning) {
+        prefetchAgain = true;
+        return;
+    }
+    prefetchRunning = true;
+    try {
+        do {
+            prefetchAgain = false;
+            const response = await fetch(`/audio_manifest?count=${PREFETCH_COUNT}`);
+            if (!response.ok) {
+                break;
+            }
+            const manifest = await response.json();
+            for (const item of manifest.phrases) {
+                if (prefetchedAudio.has(item.audio_url)) {
+                    continue;
+                }
+                const audioResponse = await fetch(item.audio_url);
+                if (audioResponse.ok) {
+                    rememberPrefetchedAudio(item.audio_url, URL.createObjectURL(await audioResponse.blob()));
+                }
+            }
+        } while (prefetchAgain);
+    } catch (error) {
+        console.error('Error prefetching audio:', error);
+    } finally {
+        prefetchRunning = false;
+    }
+}
+
+function rememberPrefetchedAudio(url, objectUrl) {
+    prefetchedAudio.set(url, objectUrl);
+    while (prefetchedAudio.size > PREFETCH_BUFFER_SIZE) {
+        const [oldestUrl, oldestObjectUrl] = prefetchedAudio.entries().next().value;
+        prefetchedAudio.delete(oldestUrl);
+        URL.revokeObjectURL(oldestObjectUrl);
+    }
+}
+
+// Return the in-memory copy of a clip if it was prefetched, marking it recently used
+function takePrefetchedAudio(url) {
+    const objectUrl = prefetchedAudio.get(url);
+    if (objectUrl) {
+        prefetchedAudio.delete(url);
+        prefetchedAudio.set(url, objectUrl);
+    }
+    return objectUrl;
+}
+
+function clearPrefetchedAudio() {
+    prefetchedAudio.forEach(objectUrl => URL.revokeObjectURL(objectUrl));
+    prefetchedAudio.clear();
+}
+
+function disconnectPreloadEvents() {
+    if (preloadEvents) {
+        preloadEvents.close();
+        preloadEvents = null;
+    }
+}
+
+function updatePreloadStatus() {
+    renderPending = false;
+    const status = preloadedStatus;
+    if (!status.cached) return;
+
+    // Show the preload status section
+    const preloadStatusEl = document.getElementById('preloadStatus');
+    const pastIndicatorsEl = document.getElementById('pastIndicators');
+    const currentIndicatorEl = document.getElementById('currentIndicator');
+    const futureIndicatorsEl = document.getElementById('futureIndicators');
+    const statsEl = document.getElementById('cacheStats');
+
+    preloadStatusEl.classList.remove('hidden');
+
+    // Clear previous indicators
+    pastIndicatorsEl.innerHTML = '';
+    currentIndicatorEl.innerHTML = '';
+    futureIndicatorsEl.innerHTML = '';
+
+    const currentIndex = status.index;
+    const totalPhrases = status.total || 0;
+
+    // Update progress bar
+    updateProgressBar(currentIndex, totalPhrases);
+
+    const makeDot = (i, cachedClass) => {
+        const dot = document.createElement('div');
+        dot.className = 'preload-indicator';
+        if (status.cached.has(i)) {
+            dot.classList.add(cachedClass);
+            dot.title = `Cached: ${i}`;
+        } else if (status.failed.has(i)) {
+            dot.classList.add('preload-failed');
+            dot.title = `Failed: ${i}`;
+        } else {
+            dot.title = `Not cached: ${i}`;
+        }
+        return dot;
+    };
+
+    // Create past indicators (up to 10)
+    const pastStart = Math.max(0, currentIndex - 10);
+    for (let i = pastStart; i < currentIndex; i++) {
+        pastIndicatorsEl.appendChild(makeDot(i, 'preload-past'));
+    }
+
+    // Create current indicator
+    const currentDot = document.createElement('div');
+    currentDot.className = 'preload-indicator preload-current';
+    currentDot.title = `Current: ${currentIndex}`;
+    currentIndicatorEl.appendChild(currentDot);
+
+    // Create future indicators (up to 20 for better display)
+    const futureEnd = Math.min(currentIndex + 20, totalPhrases - 1);
+    for (let i = currentIndex + 1; i <= futureEnd; i++) {
+        futureIndicatorsEl.appendChild(makeDot(i, 'preload-loaded'));
+    }
+
+    // Update stats
+    statsEl.textContent = `Position: ${currentIndex + 1} of ${totalPhrases}${status.loading ? '+ (loading)' : ''} | Cached: ${status.cached.size} phrases`;
+}
+
+async function search() {
+    const searchInput = document.getElementById('searchInput');
+    const query = searchInput.value.trim();
+
+    if (!query) {
+        alert('Please enter a search term');
+        return;
+    }
+
+    lastSearch = query;
+    await runSearch({ search_string: query });
+}
+
+// Step to the next or previous match of the last search
+function stepMatch(direction) {
+    if (lastSearch) {
+        runSearch({ search_string: lastSearch, direction });
+    }
+}
+
+function renderSearchResults(result) {
+    const matchesEl = document.getElementById('searchMatches');
+    document.getElementById('searchCount').textContent = `Match ${result.position} of ${result.total}`;
+    matchesEl.innerHTML = '';
+
+    result.matches.forEach(match => {
+        const item = document.createElement('li');
+        item.textContent = match.snippet;
+        item.title = `Phrase ${match.index + 1}`;
+        if (match.index === result.index) {
+            item.classList.add('active');
+        }
+        item.addEventListener('click', () => runSearch({ search_string: lastSearch, index: match.index }));
+        matchesEl.appendChild(item);
+    });
+
+    document.getElementById('searchResults').classList.remove('hidden');
+}
+
+async function runSearch(body) {
+    const spinner = document.getElementById('audioSpinner');
+    spinner.classList.remove('hidden');
+
+    try {
+        const searchResponse = await fetch('/search', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify(body)
+        });
+
+        const searchResult = await searchResponse.json();
+
+        if (searchResult.success) {
+            // The search response carries the matched phrase and its audio too
+            renderSearchResults(searchResult);
+            document.getElementById('navigationControls').classList.remove('hidden');
+            showPhrase(searchResult);
+        } else {
+            spinner.classList.add('hidden');
+            alert('Error: ' + (searchResult.error || 'Search failed'));
+        }
+    } catch (error) {
+        spinner.classList.add('hidden');
+        alert('Search failed: ' + error.message);
+    }
+}
+
+// Fill the chapter list, refreshing while later chapters are still being indexed
+async function loadChapters() {
+    try {
+        const response = await fetch('/chapters');
+        if (!response.ok) return;
+        const data = await response.json();
+        const chapterSelect = document.getElementById('chapterSelect');
+
+        if (data.chapters.length > 0) {
+            const selected = chapterSelect.value;
+            chapterSelect.innerHTML = '';
+            data.chapters.forEach(chapter => {
+                const option = document.createElement('option');
+                option.value = chapter.index;
+                option.textContent = chapter.title;
+                chapterSelect.appendChild(option);
+            });
+            if (selected) chapterSelect.value = selected;
+            chapterSelect.classList.remove('hidden');
+        }
+
+        if (data.loading) {
+            setTimeout(loadChapters, 3000);
+        }
+    } catch (error) {
+        console.error('Error loading chapters:', error);
+    }
+}
+
+function goToChapter() {
+    const index = parseInt(document.getElementById('chapterSelect').value, 10);
+    navigate('goto', { index });
+}
+
+// Show a phrase returned by /navigate or /search and play its audio
+function showPhrase(data, play = true) {
+    lastPhrase = data;
+    updateText(data.phrase);
+
+    const chapterSelect = document.getElementById('chapterSelect');
+    if (data.chapter !== null && chapterSelect.options[data.chapter]) {
+        chapterSelect.selectedIndex = data.chapter;
+    }
+
+    if (play) {
+        playPhraseAudio(data);
+    } else {
+        // Mid-burst, or following a continuous stream whose audio is already playing
+        document.getElementById('audioSpinner').classList.add('hidden');
+    }
+
+    applyPreloadEvent('cursor', { index: data.index, total: data.total_phrases, loading: data.loading });
+    prefetchUpcomingAudio();
+}
+
+// Start the audio for a shown phrase in the current reading mode
+function playPhraseAudio(data) {
+    stopContinuousStream();
+    pendingAudio = null;
+    if (isSilentMode) {
+        document.getElementById('audioSpinner').classList.add('hidden');
+    } else if (isContinuousMode) {
+        startContinuousStream(data.index);
+    } else if (data.audio_job) {
+        awaitPhraseAudio(data);
+    } else {
+        // audio_url is content-addressed once synthesized, so replays come from the browser cache
+        playAudio(data.audio || takePrefetchedAudio(data.audio_url) || data.audio_url);
+    }
+}
+
+// Play from a phrase to the end of its chapter as one gapless stream, then carry on with the next chapter
+function startContinuousStream(index) {
+    continuousStream = {
+        id: Math.random().toString(36).slice(2),
+        segments: [],
+        end: null,
+        shownIndex: index
+    };
+    const stream = continuousStream;
+    playAudio(`/stream_audio?start=${index}&stream=${stream.id}`);
+
+    currentAudio.addEventListener('timeupdate', () => followContinuousStream(stream));
+    currentAudio.addEventListener('ended', () => {
+        const total = preloadedStatus.total;
+        if (continuousStream === stream && isContinuousMode && stream.end !== null && (total === undefined || stream.end < total - 1)) {
+            navigate('goto', { index: stream.end + 1 });
+        }
+    });
+}
+
+// Drop the current stream and its connection, if one is playing
+function stopContinuousStream() {
+    if (continuousStream && currentAudio) {
+        currentAudio.pause();
+        currentAudio.removeAttribute('src');
+        currentAudio.load();
+    }
+    continuousStream = null;
+}
+
+// Collect the time offsets the server sends as it writes each phrase into the stream
+function applyStreamEvent(type, data) {
+    const stream = continuousStream;
+    if (!stream || data.stream !== stream.id) {
+        return;
+    }
+    if (type === 'segment') {
+        stream.segments.push({ index: data.index, offset: data.offset });
+    } else if (type === 'stream_end') {
+        stream.end = data.end;
+    }
+}
+
+// Move the text along with the audio as it crosses phrase boundaries
+async function followContinuousStream(stream) {
+    if (continuousStream !== stream || !currentAudio) {
+        return;
+    }
+    let playingIndex = null;
+    for (const segment of stream.segments) {
+        if (segment.offset > currentAudio.currentTime) {
+            break;
+        }
+        playingIndex = segment.index;
+    }
+    if (playingIndex === null || playingIndex === stream.shownIndex) {
+        return;
+    }
+    stream.shownIndex = playingIndex;
+
+    // Moving the cursor also keeps the server's preload window ahead of the stream
+    const response = await fetch('/navigate', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ action: 'goto', index: playingIndex })
+    });
+    const data = await response.json();
+    if (!data.error && continuousStream === stream) {
+        showPhrase(data, false);
+    }
+}
+
+// Move within the document; text, metadata and audio come back in one response
+async function navigate(action, extra = {}, play = true) {
+    const spinner = document.getElementById('audioSpinner');
+    spinner.classList.remove('hidden');
+
+    try {
+        const response = await fetch('/navigate', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ action, ...extra })
+        });
+        const data = await response.json();
+
+        if (response.ok) {
+            showPhrase(data, play);
+            return true;
+        } else {
+            spinner.classList.add('hidden');
+
+            if (data.error === 'End of document') {
+                updateText('You have reached the end of the document.');
+            } else if (data.error === 'Beginning of document') {
+                updateText('You are at the beginning of the document.');
+            } else {
+                alert('Error: ' + data.error);
+            }
+        }
+    } catch (error) {
+        spinner.classList.add('hidden');
+        alert('Error: ' + error.message);
+    }
+    return false;
+}
+
+function nextPhrase() {
+    stepPhrase(1);
+}
+
+function prevPhrase() {
+    stepPhrase(-1);
+}
+
+// Move by delta phrases; moves made while one is in flight go out together as one step
+function stepPhrase(delta) {
+    pendingSteps += delta;
+    if (!stepping) {
+        flushSteps();
+    }
+}
+
+async function flushSteps() {
+    stepping = true;
+    stopContinuousStream();
+    pendingAudio = null;
+    if (currentAudio) {
+        currentAudio.pause();
+        isPlaying = false;
+    }
+
+    let moved = false;
+    while (pendingSteps !== 0) {
+        const delta = pendingSteps;
+        pendingSteps = 0;
+        moved = (await navigate('step', { delta }, false)) || moved;
+    }
+    stepping = false;
+
+    // Only the phrase the burst lands on gets audio; while an arrow is held, wait for its release
+    if (moved && !holdingArrow) {
+        playPhraseAudio(lastPhrase);
+    }
+}
+
+function replayPhrase() {
+    return navigate('current');
+}
+
+function startFromBeginning() {
+    return navigate('start');
+}
+
+function setBackground(type, file) {
+    const body = document.body;
+    const video = document.getElementById('background-video');
+
+    // Remove selected class from all items
+    document.querySelectorAll('.media-item').forEach(item => item.classList.remove('selected'));
+
+    // Add selected class to the clicked item
+    const selectedItem = document.querySelector(`.media-item[data-file="${file}"]`);
+    if (selectedItem) {
+        selectedItem.classList.add('selected');
+    }
+
+    currentMedia = { type, file };
+
+    if (type === 'image') {
+        body.style.backgroundImage = `url('/static/${file}')`;
+        video.style.display = 'none';
+        video.pause();
+    } else {
+        video.src = `/static/${file}`;
+        video.style.display = 'block';
+        video.style.opacity = 1;
+        video.play();
+        body.style.backgroundImage = 'none';
+    }
+}
+
+// Add one page of background media thumbnails to the grid
+function loadMediaPage(offset) {
+    return fetch(`/get_media_files?offset=${offset}`)
+        .then(response => response.json())
+        .then(data => {
+            const mediaGrid = document.getElementById('mediaGrid');
+            data.items.forEach(item => {
+                const gridItem = document.createElement('div');
+                gridItem.className = 'media-item';
+                gridItem.dataset.type = item.type;
+                gridItem.dataset.file = item.file;
+                if (item.file === currentMedia.file) {
+                    gridItem.classList.add('selected');
+                }
+
+                // Only the thumbnail is fetched here, and only once it nears the viewport;
+                // the full file is loaded by setBackground when selected
+                const img = document.createElement('img');
+                img.loading = 'lazy';
+                img.decoding = 'async';
+                img.alt = item.file;
+                img.src = item.thumbnail;
+                img.addEventListener('error', () => img.remove());
+                gridItem.appendChild(img);
+
+                if (item.type === 'video') {
+                    const videoIcon = document.createElement('div');
+                    videoIcon.className = 'video-icon';
+                    videoIcon.innerHTML = icon('play');
+                    gridItem.appendChild(videoIcon);
+                }
+
+                mediaGrid.appendChild(gridItem);
+
+                gridItem.addEventListener('click', () => {
+                    setBackground(item.type, item.file);
+                });
+            });
+
+            if (data.next_offset !== null) {
+                watchMediaGridEnd(data.next_offset);
+            }
+        });
+}
+
+// Load the next page once the last thumbnail scrolls into view
+function watchMediaGridEnd(nextOffset) {
+    const lastItem = document.getElementById('mediaGrid').lastElementChild;
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            observer.disconnect();
+            loadMediaPage(nextOffset);
+        }
+    }, { rootMargin: '200px' });
+    observer.observe(lastItem);
+}
+
+// Set up event listeners
+document.addEventListener('DOMContentLoaded', () => {
+    // Toggle controls panel
+    document.getElementById('controlsToggle').addEventListener('click', toggleControls);
+    document.getElementById('overlay').addEventListener('click', toggleControls);
+
+    // Silent mode toggle
+    document.getElementById('silentModeToggle').addEventListener('change', (e) => {
+        isSilentMode = e.target.checked;
+        if (isSilentMode && currentAudio) {
+            currentAudio.pause();
+            isPlaying = false;
+            document.getElementById('playPauseBtn').innerHTML = icon('play');
+        }
+    });
+
+    // Continuous mode toggle; takes effect from the next phrase change or replay
+    document.getElementById('continuousModeToggle').addEventListener('change', (e) => {
+        isContinuousMode = e.target.checked;
+        if (!isContinuousMode) {
+            stopContinuousStream();
+        }
+    });
+
+    // Start from beginning button
+    document.getElementById('startFromBeginning').addEventListener('click', startFromBeginning);
+
+    // One delegated handler looks up any clicked word
+    document.getElementById('currentPhrase').addEventListener('click', (e) => {
+        const word = e.target.closest('.w');
+        if (word) {
+            window.open(`https://www.google.com/search?q=define+${encodeURIComponent(word.textContent)}`, '_blank');
+        }
+    });
+
+    // File input change event
+    document.getElementById('fileInput').addEventListener('change', () => {
+        const fileInput = document.getElementById('fileInput');
+        const uploadBtn = document.getElementById('uploadBtn');
+
+        if (fileInput.files && fileInput.files[0]) {
+            uploadBtn.disabled = false;
+        } else {
+            uploadBtn.disabled = true;
+        }
+    });
+
+    // Keyboard navigation
+    document.addEventListener('keydown', (e) => {
+        // Only respond to keyboard shortcuts if a document is loaded
+        if (document.getElementById('navigationControls').classList.contains('hidden')) {
+            return;
+        }
+
+        switch (e.key) {
+            case 'ArrowLeft':
+                holdingArrow = e.repeat;
+                prevPhrase();
+                break;
+            case 'ArrowRight':
+                holdingArrow = e.repeat;
+                nextPhrase();
+                break;
+            case 'ArrowUp':
+                replayPhrase();
+                break;
+            case ' ': // Space bar
+                e.preventDefault(); // Prevent scrolling
+                togglePlayPause();
+                break;
+        }
+    });
+
+    // Releasing a held arrow plays the phrase the burst landed on
+    document.addEventListener('keyup', (e) => {
+        if ((e.key === 'ArrowLeft' || e.key === 'ArrowRight') && holdingArrow) {
+            holdingArrow = false;
+            if (!stepping && lastPhrase) {
+                playPhraseAudio(lastPhrase);
+            }
+        }
+    });
+
+    // Fetch the first page of media; more pages load as the grid scrolls into view
+    loadMediaPage(0);
+
+    // Background video event listeners
+    const backgroundVideo = document.getElementById('background-video');
+    let isFading = false;
+
+    backgroundVideo.addEventListener('timeupdate', function() {
+        if (!isFading && backgroundVideo.duration && backgroundVideo.currentTime >= backgroundVideo.duration - 0.1) {
+            isFading = true;
+            backgroundVideo.style.transition = 'opacity 0.1s ease';
+            backgroundVideo.style.opacity = 0.7; // Higher opacity to reduce black flash
+            backgroundVideo.currentTime = 0;
+        }
+    });
+
+    backgroundVideo.addEventListener('seeked', function() {
+        if (isFading) {
+            backgroundVideo.style.transition = 'opacity 0.1s ease';
+            backgroundVideo.style.opacity = 1; // Reset to full opacity
+            isFading = false;
+        }
+    });
+
+    // Fallback in case something goes wrong with timeupdate
+    backgroundVideo.addEventListener('ended', function() {
+        backgroundVideo.currentTime = 0;
+        backgroundVideo.style.transition = 'none';
+        backgroundVideo.style.opacity = 1;
+        isFading = false;
+        backgroundVideo.play();
+    });
+});